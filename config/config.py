@@ -10,10 +10,16 @@ load_dotenv()
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///transactions.db"
+    DB_POOL_SIZE: int = Field(5, description="Connections kept open in the database pool")
+    DB_MAX_OVERFLOW: int = Field(10, description="Extra connections allowed beyond the pool size")
+    DB_POOL_RECYCLE: int = Field(1800, description="Seconds before a pooled connection is recycled")
+    DB_BUSY_TIMEOUT: int = Field(30, description="Seconds to wait on a locked SQLite database")
+    SQLITE_SYNCHRONOUS: str = Field("NORMAL", description="SQLite synchronous pragma (OFF, NORMAL, FULL)")
+    PROCESSING_COMMIT_CHUNK_SIZE: int = Field(10, description="Transactions processed per commit")
     
     # UnionBank
-    UNIONBANK_USERNAME: str = Field(..., description="UnionBank login username")
-    UNIONBANK_PASSWORD: str = Field(..., description="UnionBank login password")
+    UNIONBANK_USERNAME: Optional[str] = Field(None, description="UnionBank login username (default tenant)")
+    UNIONBANK_PASSWORD: Optional[str] = Field(None, description="UnionBank login password (default tenant)")
     UNIONBANK_URL: str = Field("https://unionbankph.com", description="UnionBank login URL")
     
     # Google API
@@ -22,18 +28,75 @@ class Settings(BaseSettings):
     
     # Slack
     SLACK_API_KEY: Optional[str] = Field(None, description="Slack Bot User OAuth Token")
+    SLACK_INVOICE_CHANNELS: Optional[str] = Field(None, description="Comma-separated channel IDs to list PDFs from instead of searching")
+    SLACK_MAX_PAGES: int = Field(10, description="Maximum result pages fetched per Slack query")
+    SLACK_RATE_LIMIT_RETRIES: int = Field(3, description="Retries after a Slack HTTP 429, honouring Retry-After")
     
     # CloudCFO
     CLOUDCFO_URL: str = Field("https://cloudcfo.com", description="CloudCFO base URL")
-    CLOUDCFO_USERNAME: str = Field(..., description="CloudCFO login username")
-    CLOUDCFO_PASSWORD: str = Field(..., description="CloudCFO login password")
+    CLOUDCFO_USERNAME: Optional[str] = Field(None, description="CloudCFO login username (default tenant)")
+    CLOUDCFO_PASSWORD: Optional[str] = Field(None, description="CloudCFO login password (default tenant)")
     
+    # Source resilience
+    SOURCE_TIMEOUT_SECONDS: int = Field(60, description="Hard timeout per Gmail/Slack/Drive call")
+    PORTAL_TIMEOUT_SECONDS: int = Field(120, description="Hard timeout per vendor portal search, including login")
+    BREAKER_FAILURE_RATE: float = Field(0.5, description="Failure rate that opens a source's circuit")
+    BREAKER_WINDOW: int = Field(10, description="Recent calls considered for the failure rate")
+    BREAKER_MIN_CALLS: int = Field(4, description="Calls needed in the window before a circuit can open")
+    BREAKER_COOLDOWN_SECONDS: int = Field(300, description="Seconds an open circuit waits before a trial call")
+
+    # Source ordering
+    ADAPTIVE_SOURCE_ORDERING: bool = Field(True, description="Order invoice sources per vendor by past hit rate and latency")
+    SOURCE_PRUNE_MIN_ATTEMPTS: int = Field(10, description="Attempts without a hit before a source is skipped for a vendor")
+    SOURCE_REEXPLORE_DAYS: int = Field(14, description="Days after which a skipped source is tried again")
+
+    # Invoice verification
+    INVOICE_VERIFICATION_ENABLED: bool = Field(True, description="Also check candidate PDF dates against the transaction; amounts are always checked")
+    INVOICE_DATE_TOLERANCE_DAYS: int = Field(45, description="Days around the transaction date an invoice date may fall")
+    PDF_VERIFY_WORKERS: int = Field(2, description="Worker processes used for PDF text extraction")
+
+    # Scheduling
+    CYCLE_INTERVAL_SECONDS: int = Field(900, description="Seconds between scheduled processing cycles")
+    ADMIN_API_TOKEN: Optional[str] = Field(None, description="Bearer token for the admin API; unset disables it")
+
+    # Scraping
+    SCRAPE_INSERT_BATCH_SIZE: int = Field(100, description="Scraped transactions written per database batch")
+    SCRAPE_MAX_PAGES: int = Field(500, description="Maximum transaction pages followed per scrape; regular cycles stop at the first page without new rows")
+
+    # Tenants
+    TENANTS: Optional[str] = Field(None, description="JSON list of tenants with their own bank, CloudCFO and source credentials")
+    TENANT_CONCURRENCY: int = Field(2, description="Tenant cycles run at the same time")
+    TENANT_MAX_TRANSACTIONS_PER_TURN: int = Field(50, description="Transactions a tenant processes before yielding its slot")
+    TENANT_IDLE_MAX_INTERVAL_SECONDS: int = Field(3600, description="Longest gap between cycles of an idle tenant when several tenants are served")
+    BROWSER_MAX_TENANTS: int = Field(2, description="Tenants using the shared Chromium at the same time")
+
+    # Backfill
+    BACKFILL_CHUNK_DAYS: int = Field(7, description="Days of bank history per backfill chunk")
+    BACKFILL_CONCURRENCY: int = Field(3, description="Backfill chunks processed in parallel")
+    BACKFILL_CHUNKS_PER_MINUTE: int = Field(6, description="Maximum backfill chunks started per minute")
+
+    # Archival
+    ARCHIVE_ENABLED: bool = Field(False, description="Archive old finished records from the worker loop")
+    ARCHIVE_RETENTION_DAYS: int = Field(90, description="Days uploaded transactions and errors stay in the hot tables")
+    ARCHIVE_INTERVAL_HOURS: int = Field(24, description="Hours between archival runs in the worker")
+    ARCHIVE_BATCH_SIZE: int = Field(1000, description="Transactions archived per database transaction")
+    ARCHIVE_DIR: str = Field("archive", description="Directory of compressed archive files")
+    INVOICE_FILE_RETENTION_DAYS: int = Field(7, description="Days a PDF stays on disk after its CloudCFO upload")
+
     # Monitoring
     LOG_LEVEL: str = Field("INFO", description="Logging level")
     ALERT_EMAIL: Optional[str] = Field(None, description="Email for alerts")
     API_RATE_LIMIT: int = Field(100, description="API rate limit per minute")
     RETRY_MAX_ATTEMPTS: int = Field(3, description="Maximum retry attempts")
     RETRY_INITIAL_DELAY: int = Field(1, description="Initial retry delay in seconds")
+    BROWSER_PROFILING: bool = Field(False, description="Time every Playwright page action")
+    BROWSER_SLOW_STEP_MS: int = Field(5000, description="Steps at least this slow keep a Playwright trace")
+    BROWSER_PROFILE_TRACES: bool = Field(True, description="Save Playwright traces of slow steps when profiling")
+    BROWSER_PROFILE_HAR: bool = Field(False, description="Keep a HAR file for browser sessions that had a slow step")
+    BROWSER_PROFILE_FILE: str = Field("logs/browser_steps.jsonl", description="JSON-lines file of step timings")
+    BROWSER_PROFILE_ARTIFACTS_DIR: str = Field("logs/browser_traces", description="Directory for slow-step traces and HARs")
+    TRACING_ENABLED: bool = Field(True, description="Record per-transaction spans")
+    TRACE_FILE: str = Field("logs/traces.jsonl", description="JSON-lines file spans are exported to")
 
     @validator('GMAIL_API_KEY', 'DRIVE_API_KEY', pre=True)
     def validate_json_credentials(cls, v):
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List
+
+from sqlalchemy import delete, update
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from config.config import settings
+from src.database import create_engine
+from src.models import Transaction, ProcessingError, ArchivedTransaction
+from src.tenants import DEFAULT_TENANT
+from scripts.synthetic_data import DataProfile, populate
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, 'benchmarks', 'persistence_baseline.json')
+DEFAULT_DATA_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'data')
+BENCH_PREFIX = 'BENCH'
+# Same filter as TransactionManager.process_pending_transactions
+PENDING = (Transaction.tenant == DEFAULT_TENANT, Transaction.status == 'pending')
+
+class PersistenceBenchmark:
+    """
+    Times the queries TransactionManager runs each cycle against a populated database
+
+    Each case mirrors the statement the worker issues: the per-batch dedup
+    lookup and insert of store_transaction_stream, the pending selection of
+    process_pending_transactions (first pass and re-query), and the status
+    updates and chunked commits made while processing.
+    """
+
+    def __init__(self, engine, seed: int = 7):
+        self.SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.rng = random.Random(seed)
+        self.batch_size = settings.SCRAPE_INSERT_BATCH_SIZE
+        self.chunk_size = settings.PROCESSING_COMMIT_CHUNK_SIZE
+        self._new_ids = 0
+        self._sample_ids: List[str] = []
+
+    async def setup(self):
+        # Recently scraped ids are the ones a real batch overlaps with
+        async with self.SessionLocal() as session:
+            result = await session.execute(
+                select(Transaction.transaction_id).order_by(Transaction.id.desc()).limit(self.batch_size * 20)
+            )
+            self._sample_ids = list(result.scalars().all())
+
+    async def dedup_lookup(self) -> Dict[str, float]:
+        existing = self.rng.sample(self._sample_ids, min(len(self._sample_ids), self.batch_size // 2))
+        batch = existing + [self._new_transaction_id() for _ in range(self.batch_size - len(existing))]
+        async with self.SessionLocal() as session:
+            started = time.perf_counter()
+            result = await session.execute(
+                select(Transaction.transaction_id).where(Transaction.transaction_id.in_(batch))
+            )
+            known = set(result.scalars().all())
+            # Ids not in the hot table are checked against archived tombstones, as _insert_batch does
+            unknown = [transaction_id for transaction_id in batch if transaction_id not in known]
+            if unknown:
+                result = await session.execute(
+                    select(ArchivedTransaction.transaction_id).where(ArchivedTransaction.transaction_id.in_(unknown))
+                )
+                known.update(result.scalars().all())
+            return {'dedup_lookup': time.perf_counter() - started}
+
+    async def insert_batch(self) -> Dict[str, float]:
+        now = datetime.utcnow()
+        async with self.SessionLocal() as session:
+            started = time.perf_counter()
+            for _ in range(self.batch_size):
+                session.add(Transaction(
+                    transaction_id=self._new_transaction_id(),
+                    amount=Decimal('42.00'),
+                    date=now,
+                    vendor='Benchmark Vendor',
+                    status='uploaded'
+                ))
+            await session.commit()
+            elapsed = time.perf_counter() - started
+
+            await session.execute(delete(Transaction).where(Transaction.vendor == 'Benchmark Vendor'))
+            await session.commit()
+        return {'insert_batch': elapsed}
+
+    async def pending_selection(self) -> Dict[str, float]:
+        async with self.SessionLocal() as session:
+            started = time.perf_counter()
+            result = await session.execute(select(Transaction).where(*PENDING))
+            pending = result.scalars().all()
+            first_pass = time.perf_counter() - started
+
+            # The re-query after a batch excludes everything seen this cycle
+            seen = [transaction.id for transaction in pending]
+            started = time.perf_counter()
+            query = select(Transaction).where(*PENDING)
+            if seen:
+                query = query.where(Transaction.id.notin_(seen))
+            (await session.execute(query)).scalars().all()
+            return {'pending_selection': first_pass, 'pending_requery': time.perf_counter() - started}
+
+    async def status_update_and_commit(self) -> Dict[str, float]:
+        async with self.SessionLocal() as session:
+            result = await session.execute(
+                select(Transaction).where(*PENDING).limit(self.chunk_size)
+            )
+            transactions = result.scalars().all()
+            if not transactions:
+                return {}
+
+            started = time.perf_counter()
+            for transaction in transactions:
+                transaction.status = 'failed'
+                session.add(ProcessingError(
+                    transaction_id=transaction.id,
+                    error_type='InvoiceNotFound',
+                    error_message=BENCH_PREFIX
+                ))
+            await session.flush()
+            flushed = time.perf_counter()
+            await session.commit()
+            committed = time.perf_counter()
+
+            # Put the rows back so every run sees the same data
+            ids = [transaction.id for transaction in transactions]
+            await session.execute(update(Transaction).where(Transaction.id.in_(ids)).values(status='pending'))
+            await session.execute(delete(ProcessingError).where(ProcessingError.error_message == BENCH_PREFIX))
+            await session.commit()
+        return {'status_update': flushed - started, 'commit': committed - flushed}
+
+    def _new_transaction_id(self) -> str:
+        self._new_ids += 1
+        return f"{BENCH_PREFIX}{self._new_ids:012d}"
+
+    async def run(self, runs: int, warmup: int = 2) -> Dict[str, List[float]]:
+        await self.setup()
+        cases = [self.dedup_lookup, self.insert_batch, self.pending_selection, self.status_update_and_commit]
+        timings = defaultdict(list)
+        for case in cases:
+            for i in range(warmup + runs):
+                result = await case()
+                if i >= warmup:
+                    for name, seconds in result.items():
+                        timings[name].append(seconds * 1000)
+        return timings
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(timings: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            'median_ms': round(statistics.median(values), 3),
+            'p95_ms': round(percentile(values, 95), 3),
+        }
+        for name, values in timings.items()
+    }
+
+def compare(results: Dict, baseline: Dict, threshold: float, slack_ms: float) -> List[str]:
+    """Return the cases whose median exceeds baseline * threshold + slack_ms"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        limit = reference['median_ms'] * threshold + slack_ms
+        if result['median_ms'] > limit:
+            regressions.append(f"{name}: {result['median_ms']:.2f}ms > {limit:.2f}ms "
+                               f"(baseline {reference['median_ms']:.2f}ms)")
+    return regressions
+
+def load_baselines(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baselines(path: str, baselines: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+async def benchmark_database(database_url: str, rows: int, runs: int) -> tuple:
+    engine = create_engine(database_url)
+    try:
+        started = time.perf_counter()
+        counts = await populate(engine, DataProfile(rows))
+        print(f"\n{engine.dialect.name}: {', '.join(f'{t}={c}' for t, c in counts.items())} "
+              f"(ready in {time.perf_counter() - started:.1f}s)")
+        timings = await PersistenceBenchmark(engine).run(runs)
+        return engine.dialect.name, summarize(timings)
+    finally:
+        await engine.dispose()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the persistence layer on synthetic data")
+    parser.add_argument('--database-url', action='append', dest='database_urls',
+                        help="Scratch database to WIPE and benchmark; repeat for several backends. "
+                             "Defaults to a SQLite file under benchmarks/data/")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic transactions to generate")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per case")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="Fail if a median exceeds baseline median times this factor")
+    parser.add_argument('--slack-ms', type=float, default=1.0,
+                        help="Absolute allowance added to each limit so sub-millisecond cases don't flap")
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--require-baseline', action='store_true',
+                        help="Fail when a backend has no baseline for this row count (use in CI)")
+    args = parser.parse_args()
+
+    database_urls = args.database_urls or [
+        f"sqlite+aiosqlite:///{os.path.join(DEFAULT_DATA_DIR, f'persistence_{args.rows}.db')}"
+    ]
+    os.makedirs(DEFAULT_DATA_DIR, exist_ok=True)
+
+    baselines = load_baselines(args.baseline)
+    failed = False
+    for database_url in database_urls:
+        backend, results = await benchmark_database(database_url, args.rows, args.runs)
+        key = f"{backend}-{args.rows}"
+        baseline = baselines.get(key, {})
+
+        print(f"{'case':<20} {'median':>10} {'p95':>10} {'baseline':>10}")
+        for name, result in results.items():
+            reference = f"{baseline[name]['median_ms']:8.2f}ms" if name in baseline else f"{'-':>10}"
+            print(f"{name:<20} {result['median_ms']:8.2f}ms {result['p95_ms']:8.2f}ms {reference}")
+
+        if args.update_baseline:
+            baselines[key] = results
+            continue
+        if not baseline:
+            print(f"No baseline for {key}; run with --update-baseline to record one")
+            failed = failed or args.require_baseline
+            continue
+        for regression in compare(results, baseline, args.threshold, args.slack_ms):
+            print(f"  ❌ {regression}")
+            failed = True
+
+    if args.update_baseline:
+        save_baselines(args.baseline, baselines)
+        print(f"\nBaseline written to {args.baseline}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
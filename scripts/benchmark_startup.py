@@ -0,0 +1,49 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import os
+
+# Each target mirrors what a process restart pays before doing useful work
+TARGETS = {
+    'src.main': "from src.main import TransactionManager; TransactionManager()",
+    'src.health': "import src.health",
+}
+
+def time_target(code: str, runs: int) -> list:
+    """Run the snippet in a fresh interpreter and return wall times in seconds"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=project_root,
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold startup time of the worker and health app")
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreter runs per target")
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help="Exit non-zero if any target's median exceeds this")
+    args = parser.parse_args()
+
+    failed = False
+    for name, code in TARGETS.items():
+        timings = time_target(code, args.runs)
+        median = statistics.median(timings)
+        print(f"{name:12} median={median * 1000:8.1f}ms min={min(timings) * 1000:8.1f}ms "
+              f"max={max(timings) * 1000:8.1f}ms")
+        if args.max_seconds is not None and median > args.max_seconds:
+            print(f"  ❌ {name} exceeds {args.max_seconds}s")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+
+def load_steps(path: str) -> list:
+    steps = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                steps.append(json.loads(line))
+    return steps
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def print_step_breakdown(steps: list, limit: int):
+    durations = defaultdict(list)
+    for step in steps:
+        durations[(step['site'], step['step'])].append(step['duration_ms'])
+
+    print(f"\nSlowest {limit} steps by total time")
+    print(f"{'site':<20} {'step':<50} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'total':>10}")
+    ranked = sorted(durations.items(), key=lambda item: sum(item[1]), reverse=True)
+    for (site, name), values in ranked[:limit]:
+        print(f"{site:<20} {name[:50]:<50} {len(values):>6} "
+              f"{percentile(values, 50):>7.0f}ms {percentile(values, 90):>7.0f}ms "
+              f"{percentile(values, 99):>7.0f}ms {max(values):>7.0f}ms {sum(values) / 1000:>9.1f}s")
+
+def print_slow_traces(steps: list):
+    slow = [s for s in steps if s.get('trace_file')]
+    if not slow:
+        return
+    print("\nSaved traces of slow steps (open with `playwright show-trace <file>`)")
+    for step in sorted(slow, key=lambda s: s['duration_ms'], reverse=True):
+        print(f"{step['duration_ms']:>9.0f}ms  {step['site']:<20} {step['step'][:50]:<50} {step['trace_file']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize browser step timings recorded with BROWSER_PROFILING")
+    parser.add_argument('--file', default=os.getenv('BROWSER_PROFILE_FILE', 'logs/browser_steps.jsonl'),
+                        help="Step timings JSON-lines file")
+    parser.add_argument('--site', default=None, help="Only show steps for this site (e.g. unionbank, cloudcfo, portal:aws)")
+    parser.add_argument('--limit', type=int, default=20, help="Number of steps to show")
+    args = parser.parse_args()
+
+    steps = load_steps(args.file)
+    if args.site:
+        steps = [s for s in steps if s['site'] == args.site]
+
+    if not steps:
+        print("No browser steps recorded")
+        return
+
+    print_step_breakdown(steps, args.limit)
+    print_slow_traces(steps)
+
+if __name__ == "__main__":
+    main()
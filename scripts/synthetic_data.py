@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List
+
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src.database import create_engine
+from src.models import Base, Transaction, Invoice, ProcessingError, ArchivedTransaction
+
+INSERT_CHUNK = 5000
+SOURCES = ['gmail', 'slack', 'drive', 'portal']
+SOURCE_WEIGHTS = [0.5, 0.15, 0.2, 0.15]
+ERROR_TYPES = ['InvoiceNotFound', 'TimeoutError', 'CircuitOpenError', 'HTTPError', 'PlaywrightTimeoutError']
+ERROR_WEIGHTS = [0.55, 0.2, 0.1, 0.1, 0.05]
+VENDOR_NAMES = ['AWS', 'Google Cloud', 'Slack', 'GitHub', 'Notion', 'Figma', 'Zoom', 'Atlassian',
+                'Microsoft', 'Adobe', 'Dropbox', 'Heroku', 'DigitalOcean', 'Twilio', 'Stripe', 'Shopify']
+
+class DataProfile:
+    """
+    Shape of the synthetic data
+
+    Vendors follow a Zipf distribution (a handful of SaaS vendors account for
+    most spend), amounts are log-normal, and transactions are spread evenly
+    over `history_days`. Only recent transactions are still pending; older
+    ones are mostly uploaded, with a tail of failures that carry several
+    processing_errors rows from retries. `archived_rows` archived_transactions
+    tombstones stand for older history already moved to the archive.
+    """
+
+    def __init__(self, rows: int, vendors: int = 300, history_days: int = 730, pending_days: int = 30,
+                 pending_rate: float = 0.4, failed_rate: float = 0.08, archived_rows: int = None, seed: int = 42):
+        self.rows = rows
+        self.archived_rows = rows // 2 if archived_rows is None else archived_rows
+        self.vendors = vendors
+        self.history_days = history_days
+        self.pending_days = pending_days
+        self.pending_rate = pending_rate
+        self.failed_rate = failed_rate
+        self.seed = seed
+
+def _vendor_names(count: int) -> List[str]:
+    names = list(VENDOR_NAMES)
+    i = 1
+    while len(names) < count:
+        names.append(f"Vendor {i:04d} Inc")
+        i += 1
+    return names[:count]
+
+def _status(rng: random.Random, profile: DataProfile, age_days: float) -> str:
+    if age_days < profile.pending_days and rng.random() < profile.pending_rate:
+        return 'pending'
+    roll = rng.random()
+    if roll < profile.failed_rate:
+        return 'failed'
+    if roll < profile.failed_rate + 0.01:
+        return 'matched'
+    return 'uploaded'
+
+def generate_rows(profile: DataProfile, chunk_size: int = INSERT_CHUNK) -> Iterator[Dict[str, List[Dict]]]:
+    """Yield rows for transactions, invoices and processing_errors, `chunk_size` transactions at a time"""
+    rng = random.Random(profile.seed)
+    vendors = _vendor_names(profile.vendors)
+    vendor_weights = [1 / (rank ** 1.1) for rank in range(1, len(vendors) + 1)]
+    now = datetime.utcnow()
+
+    transactions, invoices, errors = [], [], []
+    for tx_id in range(1, profile.rows + 1):
+        age_days = rng.uniform(0, profile.history_days)
+        date = (now - timedelta(days=age_days)).replace(microsecond=0)
+        status = _status(rng, profile, age_days)
+        updated_at = min(now, date + timedelta(hours=rng.uniform(1, 48))) if status != 'pending' else date
+
+        transactions.append({
+            'id': tx_id,
+            'transaction_id': f"UB{date:%Y%m%d}{tx_id:010d}",
+            'amount': Decimal(str(round(min(50000.0, rng.lognormvariate(4.5, 1.2)), 2))),
+            'date': date,
+            'vendor': rng.choices(vendors, weights=vendor_weights)[0],
+            'status': status,
+            'created_at': date,
+            'updated_at': updated_at,
+        })
+
+        # Failures after a download still keep their invoice
+        has_invoice = status in ('uploaded', 'matched') or (status == 'failed' and rng.random() < 0.5)
+        if has_invoice:
+            upload_status = {'uploaded': 'uploaded', 'matched': 'pending', 'failed': 'failed'}[status]
+            invoices.append({
+                'id': tx_id,
+                'transaction_id': tx_id,
+                'file_path': f"invoices/{tx_id}.pdf",
+                'source': rng.choices(SOURCES, weights=SOURCE_WEIGHTS)[0],
+                'upload_status': upload_status,
+                'created_at': updated_at,
+                'updated_at': updated_at,
+            })
+
+        # Failed transactions are retried each cycle; a few successes also needed a retry
+        if status == 'failed':
+            retries = 1 + min(9, int(-math.log(1 - rng.random()) * 2))
+        elif rng.random() < 0.05:
+            retries = 1
+        else:
+            retries = 0
+        for retry in range(retries):
+            errors.append({
+                'transaction_id': tx_id,
+                'error_type': rng.choices(ERROR_TYPES, weights=ERROR_WEIGHTS)[0],
+                'error_message': 'Synthetic error',
+                'retry_count': retry,
+                'created_at': date + timedelta(minutes=15 * (retry + 1)),
+            })
+
+        if len(transactions) >= chunk_size:
+            yield {'transactions': transactions, 'invoices': invoices, 'processing_errors': errors}
+            transactions, invoices, errors = [], [], []
+
+    if transactions:
+        yield {'transactions': transactions, 'invoices': invoices, 'processing_errors': errors}
+
+def generate_archived(profile: DataProfile, chunk_size: int = INSERT_CHUNK) -> Iterator[List[Dict]]:
+    """Yield archived_transactions tombstones older than the hot history, `chunk_size` at a time"""
+    oldest = datetime.utcnow() - timedelta(days=profile.history_days)
+    tombstones = []
+    for archived_id in range(1, profile.archived_rows + 1):
+        date = oldest - timedelta(minutes=archived_id)
+        tombstones.append({
+            'id': archived_id,
+            'transaction_id': f"UB{date:%Y%m%d}A{archived_id:09d}",
+            'archive_file': f"archive/transactions/{date:%Y-%m}.jsonl.gz",
+            'archived_at': oldest,
+        })
+        if len(tombstones) >= chunk_size:
+            yield tombstones
+            tombstones = []
+    if tombstones:
+        yield tombstones
+
+async def populate(engine, profile: DataProfile, reuse: bool = True) -> Dict[str, int]:
+    """
+    Recreate the schema and fill it with synthetic data
+
+    Args:
+        engine: Async engine of a database that may be wiped
+        profile: Size and shape of the data
+        reuse: Keep the existing data if it already has the profile's row counts
+
+    Returns:
+        Dict[str, int]: Row counts per table
+    """
+    SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    if reuse:
+        counts = await row_counts(SessionLocal)
+        if (counts['transactions'], counts['archived_transactions']) == (profile.rows, profile.archived_rows):
+            return counts
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with SessionLocal() as session:
+        for chunk in generate_rows(profile):
+            await session.execute(insert(Transaction.__table__), chunk['transactions'])
+            if chunk['invoices']:
+                await session.execute(insert(Invoice.__table__), chunk['invoices'])
+            if chunk['processing_errors']:
+                await session.execute(insert(ProcessingError.__table__), chunk['processing_errors'])
+            await session.commit()
+        for tombstones in generate_archived(profile):
+            await session.execute(insert(ArchivedTransaction.__table__), tombstones)
+            await session.commit()
+
+    if engine.dialect.name == 'postgresql':
+        # Explicit ids leave the sequences behind; later inserts would collide
+        async with engine.begin() as conn:
+            for table in ('transactions', 'invoices', 'processing_errors', 'archived_transactions'):
+                await conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                )
+
+    # Fresh planner statistics so the benchmark sees the plans production would
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+    return await row_counts(SessionLocal)
+
+async def row_counts(SessionLocal) -> Dict[str, int]:
+    counts = {}
+    async with SessionLocal() as session:
+        for model in (Transaction, Invoice, ProcessingError, ArchivedTransaction):
+            counts[model.__tablename__] = (await session.execute(select(func.count(model.id)))).scalar()
+    return counts
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fill a scratch database with synthetic transactions, invoices and errors")
+    parser.add_argument('--database-url', required=True,
+                        help="Database to WIPE and fill, e.g. sqlite+aiosqlite:///bench.db")
+    parser.add_argument('--rows', type=int, default=100000, help="Number of transactions")
+    parser.add_argument('--vendors', type=int, default=300, help="Number of distinct vendors")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    try:
+        counts = await populate(engine, DataProfile(args.rows, vendors=args.vendors, seed=args.seed), reuse=False)
+    finally:
+        await engine.dispose()
+    for table, count in counts.items():
+        print(f"{table:20} {count:>10}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
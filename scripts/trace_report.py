@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+
+def load_spans(path: str) -> list:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+def duration_ms(span: dict) -> float:
+    return (span['endTimeUnixNano'] - span['startTimeUnixNano']) / 1e6
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def print_slowest_traces(spans: list, limit: int):
+    roots = [s for s in spans if not s.get('parentSpanId')]
+    by_trace = defaultdict(list)
+    for s in spans:
+        by_trace[s['traceId']].append(s)
+
+    print(f"\nSlowest {limit} traces")
+    print(f"{'duration':>12}  {'root':<12} {'trace id':<34} detail")
+    for root in sorted(roots, key=duration_ms, reverse=True)[:limit]:
+        attrs = root.get('attributes', {})
+        detail = ' '.join(f"{k}={v}" for k, v in attrs.items() if k != 'cycle.trace_id')
+        print(f"{duration_ms(root):10.0f}ms  {root['name']:<12} {root['traceId']:<34} {detail}")
+
+        # Show where the time went inside this trace
+        children = [s for s in by_trace[root['traceId']] if s is not root]
+        for child in sorted(children, key=duration_ms, reverse=True)[:5]:
+            status = '' if child['status']['code'] == 'OK' else f" [{child['status'].get('message', 'ERROR')}]"
+            print(f"{'':14}{duration_ms(child):10.0f}ms  {child['name']}{status}")
+
+def print_stage_breakdown(spans: list):
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for s in spans:
+        durations[s['name']].append(duration_ms(s))
+        if s['status']['code'] != 'OK':
+            errors[s['name']] += 1
+
+    print("\nPer-stage breakdown")
+    print(f"{'stage':<40} {'count':>7} {'errors':>7} {'p50':>10} {'p95':>10} {'total':>12}")
+    for name, values in sorted(durations.items(), key=lambda item: sum(item[1]), reverse=True):
+        print(f"{name:<40} {len(values):>7} {errors[name]:>7} "
+              f"{percentile(values, 50):>8.0f}ms {percentile(values, 95):>8.0f}ms {sum(values) / 1000:>11.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize spans exported by the transaction manager")
+    parser.add_argument('--file', default=os.getenv('TRACE_FILE', 'logs/traces.jsonl'), help="Trace JSON-lines file")
+    parser.add_argument('--limit', type=int, default=10, help="Number of slowest traces to show")
+    parser.add_argument('--root', default=None, help="Only consider traces whose root span has this name (e.g. transaction)")
+    args = parser.parse_args()
+
+    spans = load_spans(args.file)
+    if args.root:
+        trace_ids = {s['traceId'] for s in spans if not s.get('parentSpanId') and s['name'] == args.root}
+        spans = [s for s in spans if s['traceId'] in trace_ids]
+
+    if not spans:
+        print("No spans recorded")
+        return
+
+    print_slowest_traces(spans, args.limit)
+    print_stage_breakdown(spans)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+from loguru import logger
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from .models import Transaction, Invoice, ProcessingError, ArchivedTransaction
+from .tracing import span
+from .tenants import DEFAULT_TENANT
+from config.config import settings
+
+KINDS = ('transactions', 'errors')
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def _row_dict(row) -> Dict:
+    return {column.name: _json_value(getattr(row, column.key)) for column in row.__table__.columns}
+
+def archive_path(kind: str, month: datetime, archive_dir: str = None) -> str:
+    return os.path.join(archive_dir or settings.ARCHIVE_DIR, kind, f"{month:%Y-%m}.jsonl.gz")
+
+def append_records(path: str, records: List[Dict]):
+    """Append records as a new gzip member and fsync, so existing data is never rewritten"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+            for record in records:
+                archive.write((json.dumps(record, separators=(',', ':')) + '\n').encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+class Archiver:
+    """
+    Moves finished records out of the hot tables into compressed archive files
+
+    Uploaded transactions older than the retention window are written, together
+    with their invoice and processing errors, to archive/transactions/YYYY-MM.jsonl.gz
+    by transaction month. Errors of transactions that stay hot (failed ones) are
+    archived on their own to archive/errors/. Files are only ever appended to
+    and are fsynced before the rows are deleted, so a crash can at worst archive
+    a record twice; query() drops such duplicates. An archived_transactions
+    row is kept per transaction so rescrapes don't store it again.
+    """
+
+    def __init__(self, SessionLocal, retention_days: int = None, batch_size: int = None, archive_dir: str = None):
+        self.SessionLocal = SessionLocal
+        self.retention_days = retention_days or settings.ARCHIVE_RETENTION_DAYS
+        self.batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        self.archive_dir = archive_dir or settings.ARCHIVE_DIR
+
+    async def run(self, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Archive old records and remove local PDFs already uploaded to CloudCFO
+
+        Returns:
+            Dict[str, int]: Counts of archived transactions, errors and removed files
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        with span('archive', new_trace=True, cutoff=cutoff.isoformat(), dry_run=dry_run):
+            counts = {
+                'transactions': await self._archive_transactions(cutoff, dry_run),
+                'errors': await self._archive_errors(cutoff, dry_run),
+                'files_removed': await self.remove_uploaded_files(dry_run),
+            }
+        logger.info(
+            f"Archival {'dry run ' if dry_run else ''}done: {counts['transactions']} transactions, "
+            f"{counts['errors']} errors archived, {counts['files_removed']} invoice files removed"
+        )
+        return counts
+
+    async def _archive_transactions(self, cutoff: datetime, dry_run: bool) -> int:
+        archived = 0
+        last_id = 0
+        while True:
+            async with self.SessionLocal() as session:
+                result = await session.execute(
+                    select(Transaction).where(
+                        Transaction.status == 'uploaded',
+                        Transaction.updated_at < cutoff,
+                        Transaction.id > last_id
+                    ).order_by(Transaction.id).limit(self.batch_size)
+                )
+                transactions = result.scalars().all()
+                if not transactions:
+                    return archived
+                last_id = transactions[-1].id
+                if dry_run:
+                    archived += len(transactions)
+                    continue
+
+                ids = [transaction.id for transaction in transactions]
+                invoices = {
+                    invoice.transaction_id: invoice
+                    for invoice in (await session.execute(
+                        select(Invoice).where(Invoice.transaction_id.in_(ids))
+                    )).scalars().all()
+                }
+                errors: Dict[int, List[Dict]] = {}
+                for error in (await session.execute(
+                    select(ProcessingError).where(ProcessingError.transaction_id.in_(ids))
+                )).scalars().all():
+                    errors.setdefault(error.transaction_id, []).append(_row_dict(error))
+
+                by_file: Dict[str, List[Dict]] = {}
+                for transaction in transactions:
+                    record = _row_dict(transaction)
+                    invoice = invoices.get(transaction.id)
+                    record['invoice'] = _row_dict(invoice) if invoice else None
+                    record['errors'] = errors.get(transaction.id, [])
+                    by_file.setdefault(archive_path('transactions', transaction.date, self.archive_dir), []).append(record)
+
+                for path, records in by_file.items():
+                    append_records(path, records)
+
+                archive_files = {
+                    record['transaction_id']: (record['tenant'], path)
+                    for path, records in by_file.items() for record in records
+                }
+                await session.execute(delete(ProcessingError).where(ProcessingError.transaction_id.in_(ids)))
+                await session.execute(delete(Invoice).where(Invoice.transaction_id.in_(ids)))
+                await session.execute(delete(Transaction).where(Transaction.id.in_(ids)))
+                session.add_all([
+                    ArchivedTransaction(tenant=tenant, transaction_id=transaction_id, archive_file=path)
+                    for transaction_id, (tenant, path) in archive_files.items()
+                ])
+                await session.commit()
+
+                # Their PDFs are in CloudCFO, and no hot row points at them anymore
+                for invoice in invoices.values():
+                    await self._remove_file(session, invoice.file_path)
+
+                archived += len(transactions)
+                logger.debug(f"Archived {archived} transactions")
+
+    async def _archive_errors(self, cutoff: datetime, dry_run: bool) -> int:
+        archived = 0
+        last_id = 0
+        while True:
+            async with self.SessionLocal() as session:
+                result = await session.execute(
+                    select(ProcessingError, Transaction.transaction_id, Transaction.tenant)
+                    .outerjoin(Transaction, ProcessingError.transaction_id == Transaction.id)
+                    .where(ProcessingError.created_at < cutoff, ProcessingError.id > last_id)
+                    .order_by(ProcessingError.id)
+                    .limit(self.batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    return archived
+                last_id = rows[-1][0].id
+                if dry_run:
+                    archived += len(rows)
+                    continue
+
+                by_file: Dict[str, List[Dict]] = {}
+                for error, bank_transaction_id, tenant in rows:
+                    record = _row_dict(error)
+                    record['bank_transaction_id'] = bank_transaction_id
+                    record['tenant'] = tenant
+                    by_file.setdefault(archive_path('errors', error.created_at, self.archive_dir), []).append(record)
+                for path, records in by_file.items():
+                    append_records(path, records)
+
+                await session.execute(
+                    delete(ProcessingError).where(ProcessingError.id.in_([error.id for error, _, _ in rows]))
+                )
+                await session.commit()
+                archived += len(rows)
+
+    async def remove_uploaded_files(self, dry_run: bool = False) -> int:
+        """Delete local PDFs whose invoice was uploaded to CloudCFO more than INVOICE_FILE_RETENTION_DAYS ago"""
+        uploaded_before = datetime.utcnow() - timedelta(days=settings.INVOICE_FILE_RETENTION_DAYS)
+        removed = 0
+        async with self.SessionLocal() as session:
+            result = await session.execute(
+                select(Invoice.file_path).where(
+                    Invoice.upload_status == 'uploaded',
+                    Invoice.updated_at < uploaded_before
+                ).distinct()
+            )
+            for file_path in result.scalars().all():
+                if not os.path.exists(file_path):
+                    continue
+                if dry_run:
+                    removed += 1
+                elif await self._remove_file(session, file_path):
+                    removed += 1
+        return removed
+
+    @staticmethod
+    async def _remove_file(session, file_path: str) -> bool:
+        # The same downloaded PDF can back several invoices; keep it while any is not uploaded
+        still_needed = await session.execute(
+            select(Invoice.id).where(Invoice.file_path == file_path, Invoice.upload_status != 'uploaded').limit(1)
+        )
+        if still_needed.first() is not None:
+            return False
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Could not remove {file_path}: {str(e)}")
+            return False
+
+def _month_start(date: datetime) -> datetime:
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def iter_archive(kind: str, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                 archive_dir: str = None) -> Iterator[Dict]:
+    """Yield archived records of a kind, reading only the monthly files that overlap the range"""
+    directory = os.path.join(archive_dir or settings.ARCHIVE_DIR, kind)
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.jsonl.gz'):
+            continue
+        month = datetime.strptime(name[:7], '%Y-%m')
+        if date_from and month < _month_start(date_from):
+            continue
+        if date_to and month > date_to:
+            continue
+        # A crash between writing and deleting can archive a row twice, always
+        # into the same monthly file. Row ids alone aren't stable: SQLite reuses
+        # them once the highest rows are deleted.
+        seen = set()
+        with gzip.open(os.path.join(directory, name), 'rt') as archive:
+            for line in archive:
+                record = json.loads(line)
+                key = _record_key(kind, record)
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield record
+
+def _record_key(kind: str, record: Dict) -> tuple:
+    if kind == 'transactions':
+        return record.get('tenant'), record['transaction_id']
+    return record['id'], record['created_at']
+
+def query(kind: str, transaction_id: str = None, vendor: str = None, date_from: datetime = None,
+          date_to: datetime = None, tenant: str = None, archive_dir: str = None) -> Iterator[Dict]:
+    date_field = 'date' if kind == 'transactions' else 'created_at'
+    id_field = 'transaction_id' if kind == 'transactions' else 'bank_transaction_id'
+    for record in iter_archive(kind, date_from, date_to, archive_dir):
+        if transaction_id and record.get(id_field) != transaction_id:
+            continue
+        if tenant and (record.get('tenant') or DEFAULT_TENANT) != tenant:
+            continue
+        if vendor and vendor.lower() not in (record.get('vendor') or '').lower():
+            continue
+        record_date = datetime.fromisoformat(record[date_field])
+        if date_from and record_date < date_from:
+            continue
+        if date_to and record_date >= date_to + timedelta(days=1):
+            continue
+        yield record
+
+async def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='python -m src.main archive',
+                                     description="Archive old records or query the archive")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Move old finished records into the archive")
+    run_parser.add_argument('--retention-days', type=int, default=None, help="Override ARCHIVE_RETENTION_DAYS")
+    run_parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived")
+
+    date = lambda v: datetime.strptime(v, '%Y-%m-%d')
+    query_parser = subparsers.add_parser('query', help="Print archived records as JSON lines")
+    query_parser.add_argument('--kind', choices=KINDS, default='transactions')
+    query_parser.add_argument('--transaction-id', default=None, help="Bank transaction ID")
+    query_parser.add_argument('--vendor', default=None, help="Case-insensitive vendor substring")
+    query_parser.add_argument('--tenant', default=None, help="Only this tenant's records")
+    query_parser.add_argument('--from', dest='date_from', type=date, default=None, help="First day (YYYY-MM-DD)")
+    query_parser.add_argument('--to', dest='date_to', type=date, default=None, help="Last day, inclusive (YYYY-MM-DD)")
+    query_parser.add_argument('--limit', type=int, default=None, help="Stop after this many records")
+    args = parser.parse_args(argv)
+
+    if args.command == 'query':
+        for count, record in enumerate(query(args.kind, args.transaction_id, args.vendor,
+                                                   args.date_from, args.date_to, args.tenant)):
+            if args.limit is not None and count >= args.limit:
+                break
+            print(json.dumps(record))
+        return
+
+    from .main import TransactionManager
+
+    manager = TransactionManager()
+    await manager.init_db()
+    await Archiver(manager.SessionLocal, retention_days=args.retention_days).run(dry_run=args.dry_run)
@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from loguru import logger
+from sqlalchemy.future import select
+
+from .main import TransactionManager
+from .models import Transaction, BackfillCheckpoint
+from .tracing import span, current_trace_id
+from .tenants import DEFAULT_TENANT, load_tenants
+from .services.fair_share import FairRateLimiter
+from .services.invoice_verifier import verifier
+from config.config import settings
+
+def split_range(date_from: datetime, date_to: datetime, chunk_days: int) -> List[Tuple[datetime, datetime]]:
+    """Split an inclusive date range into consecutive inclusive chunks"""
+    chunks = []
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=chunk_days - 1), date_to)
+        chunks.append((start, end))
+        start = end + timedelta(days=1)
+    return chunks
+
+class Backfill:
+    """Scrapes and processes a historical date range in parallel, checkpointed per chunk"""
+
+    def __init__(self, manager: TransactionManager, date_from: datetime, date_to: datetime,
+                 chunk_days: int = None, concurrency: int = None, chunks_per_minute: int = None):
+        self.manager = manager
+        self.chunks = split_range(date_from, date_to, chunk_days or settings.BACKFILL_CHUNK_DAYS)
+        self.semaphore = asyncio.Semaphore(concurrency or settings.BACKFILL_CONCURRENCY)
+        self.rate_limiter = FairRateLimiter(chunks_per_minute or settings.BACKFILL_CHUNKS_PER_MINUTE)
+        self.started_at = None
+        self.chunks_done = 0
+        self.chunks_remaining = 0
+        self.transactions_processed = 0
+
+    async def _load_checkpoints(self) -> dict:
+        """Return existing checkpoints for our chunks, creating missing ones"""
+        async with self.manager.SessionLocal() as session:
+            result = await session.execute(
+                select(BackfillCheckpoint).where(
+                    BackfillCheckpoint.tenant == self.manager.tenant_id,
+                    BackfillCheckpoint.range_start >= self.chunks[0][0],
+                    BackfillCheckpoint.range_end <= self.chunks[-1][1]
+                )
+            )
+            checkpoints = {(c.range_start, c.range_end): c for c in result.scalars().all()}
+            for chunk in self.chunks:
+                if chunk not in checkpoints:
+                    checkpoint = BackfillCheckpoint(
+                        tenant=self.manager.tenant_id, range_start=chunk[0], range_end=chunk[1], status='pending'
+                    )
+                    session.add(checkpoint)
+                    checkpoints[chunk] = checkpoint
+            await session.commit()
+        return checkpoints
+
+    async def _update_checkpoint(self, checkpoint_id: int, **values):
+        async with self.manager.SessionLocal() as session:
+            checkpoint = await session.get(BackfillCheckpoint, checkpoint_id)
+            for key, value in values.items():
+                setattr(checkpoint, key, value)
+            await session.commit()
+
+    async def _run_chunk(self, checkpoint: BackfillCheckpoint):
+        start, end = checkpoint.range_start, checkpoint.range_end
+        async with self.semaphore:
+            await self.rate_limiter.acquire(self.manager.tenant_id)
+            with span('backfill.chunk', range_start=start.isoformat(), range_end=end.isoformat()):
+                await self._update_checkpoint(checkpoint.id, status='running', error_message=None)
+                try:
+                    found = await self.manager.store_transaction_stream(
+                        self.manager.scraper.iter_transactions(start, end)
+                    )
+                    await self._update_checkpoint(checkpoint.id, transactions_found=found)
+
+                    processed = await self.manager.process_pending_transactions(
+                        Transaction.date >= start,
+                        Transaction.date < end + timedelta(days=1)
+                    )
+                    await self._update_checkpoint(checkpoint.id, status='done', transactions_processed=processed)
+                    self.transactions_processed += processed
+
+                except Exception as e:
+                    logger.error(f"Backfill chunk {start:%Y-%m-%d}..{end:%Y-%m-%d} failed: {str(e)}")
+                    await self._update_checkpoint(checkpoint.id, status='failed', error_message=str(e))
+                    return
+
+        self.chunks_done += 1
+        self._report(start, end)
+
+    def _report(self, start: datetime, end: datetime):
+        elapsed = time.monotonic() - self.started_at
+        rate = self.chunks_done / elapsed if elapsed else 0
+        remaining = self.chunks_remaining - self.chunks_done
+        eta = timedelta(seconds=int(remaining / rate)) if rate else 'unknown'
+        logger.info(
+            f"Backfill {start:%Y-%m-%d}..{end:%Y-%m-%d} done: "
+            f"{self.chunks_done}/{self.chunks_remaining} chunks, "
+            f"{self.transactions_processed} transactions "
+            f"({self.transactions_processed / elapsed * 60:.1f}/min), ETA {eta}"
+        )
+
+    async def run(self) -> bool:
+        """
+        Run every chunk that isn't checkpointed as done
+
+        Returns:
+            bool: True if all chunks completed
+        """
+        await self.manager.init_db()
+        checkpoints = await self._load_checkpoints()
+        todo = [checkpoints[chunk] for chunk in self.chunks if checkpoints[chunk].status != 'done']
+        skipped = len(self.chunks) - len(todo)
+        if skipped:
+            logger.info(f"Resuming backfill: {skipped}/{len(self.chunks)} chunks already done")
+
+        self.started_at = time.monotonic()
+        self.chunks_remaining = len(todo)
+        with span('backfill', new_trace=True, chunks=len(todo), tenant=self.manager.tenant_id):
+            self.manager.invoice_finder.reset_cycle_cache()
+            await self.manager._load_source_stats()
+            self.manager.progress.start(current_trace_id())
+            self.manager.progress.phase = 'backfill'
+            try:
+                await asyncio.gather(*(self._run_chunk(checkpoint) for checkpoint in todo))
+            finally:
+                self.manager.progress.finish()
+                await self.manager.invoice_finder.portal_scraper.close()
+                await self.manager.flush_source_stats()
+
+        failed = self.chunks_remaining - self.chunks_done
+        if failed:
+            logger.warning(f"Backfill finished with {failed} failed chunks; rerun the same command to retry them")
+        return failed == 0
+
+async def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='python -m src.main backfill',
+                                     description="Scrape and process a historical date range")
+    parser.add_argument('--from', dest='date_from', required=True,
+                        type=lambda v: datetime.strptime(v, '%Y-%m-%d'), help="First day (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='date_to', required=True,
+                        type=lambda v: datetime.strptime(v, '%Y-%m-%d'), help="Last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument('--chunk-days', type=int, default=None, help="Days per chunk")
+    parser.add_argument('--concurrency', type=int, default=None, help="Chunks processed in parallel")
+    parser.add_argument('--tenant', default=DEFAULT_TENANT, help="Tenant whose bank history to backfill")
+    args = parser.parse_args(argv)
+
+    if args.date_from > args.date_to:
+        parser.error("--from must not be after --to")
+    tenant = next((t for t in load_tenants() if t.id == args.tenant), None)
+    if tenant is None:
+        parser.error(f"Unknown tenant {args.tenant}")
+
+    backfill = Backfill(
+        TransactionManager(tenant),
+        args.date_from,
+        args.date_to,
+        chunk_days=args.chunk_days,
+        concurrency=args.concurrency
+    )
+    try:
+        succeeded = await backfill.run()
+    finally:
+        verifier.shutdown()
+    if not succeeded:
+        raise SystemExit(1)
@@ -0,0 +1,89 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict
+from loguru import logger
+from config.config import settings
+from .browser_profiler import profiler
+from .services.fair_share import FairSemaphore
+from .tenants import DEFAULT_TENANT
+
+class BrowserPool:
+    """
+    One Chromium shared by every tenant and component of the worker
+
+    Each scrape, upload or portal session gets its own browser context, so
+    tenants' cookies and logins stay apart. At most BROWSER_MAX_TENANTS
+    tenants hold contexts at a time, with waiting tenants served round-robin.
+    A tenant's contexts share one lease, so a tenant never waits on itself.
+    The browser is closed as soon as no context is open, so idle tenants
+    cost no memory.
+    """
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self._leases = None
+        self._open: Dict[str, int] = defaultdict(int)
+        self._tenant_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._context_tenants: Dict[int, str] = {}
+
+    @property
+    def leases(self) -> FairSemaphore:
+        if self._leases is None:
+            self._leases = FairSemaphore(settings.BROWSER_MAX_TENANTS)
+        return self._leases
+
+    async def new_context(self, site: str, tenant: str = DEFAULT_TENANT):
+        """Open a browser context for a tenant, waiting for a browser lease if needed"""
+        async with self._tenant_locks[tenant]:
+            if self._open[tenant] == 0:
+                await self.leases.acquire(tenant)
+            self._open[tenant] += 1
+
+        try:
+            async with self._lock:
+                if self._browser is None:
+                    from playwright.async_api import async_playwright
+
+                    self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(headless=True)
+                browser = self._browser
+            context = await profiler.new_context(browser, site)
+        except BaseException:
+            await self._release(tenant)
+            raise
+
+        self._context_tenants[id(context)] = tenant
+        return context
+
+    async def new_page(self, context, site: str):
+        return await profiler.new_page(context, site)
+
+    async def close_context(self, context):
+        tenant = self._context_tenants.pop(id(context), None)
+        try:
+            await profiler.close_context(context)
+        finally:
+            if tenant is not None:
+                await self._release(tenant)
+
+    async def _release(self, tenant: str):
+        self._open[tenant] -= 1
+        if self._open[tenant] == 0:
+            self.leases.release(tenant)
+
+        async with self._lock:
+            if self._browser is not None and not any(self._open.values()):
+                try:
+                    await self._browser.close()
+                    await self._playwright.stop()
+                except Exception as e:
+                    logger.debug(f"Error closing shared browser: {str(e)}")
+                self._browser = None
+                self._playwright = None
+
+    def usage(self, tenant: str) -> Dict:
+        return {'open_contexts': self._open.get(tenant, 0), **self.leases.usage(tenant)}
+
+browser_pool = BrowserPool()
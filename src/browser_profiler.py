@@ -0,0 +1,191 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict
+from urllib.parse import urlparse
+from loguru import logger
+from config.config import settings
+
+# Page methods timed as steps; everything else is passed through untouched
+PROFILED_ACTIONS = frozenset({
+    'goto', 'fill', 'click', 'type', 'press', 'check', 'select_option',
+    'wait_for_load_state', 'wait_for_selector', 'wait_for_url',
+    'query_selector', 'query_selector_all', 'set_input_files',
+})
+# Page methods returning an expect_* context manager, timed from entry until the event arrived
+PROFILED_EVENTS = frozenset({'expect_download', 'expect_navigation', 'expect_popup'})
+
+def _step_target(action: str, args: tuple) -> str:
+    if not args or not isinstance(args[0], str):
+        return ''
+    if action == 'goto':
+        # Group navigations by path so query strings don't split the stats
+        parsed = urlparse(args[0])
+        return f"{parsed.netloc}{parsed.path}"
+    return args[0]
+
+class ProfiledPage:
+    """Proxy around a Playwright page that times every action as a step"""
+
+    def __init__(self, page, context, site: str, profiler: "BrowserProfiler"):
+        self._page = page
+        self._context = context
+        self._site = site
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._page, name)
+        if name in PROFILED_EVENTS:
+            return lambda *args, **kwargs: TimedEvent(attr(*args, **kwargs), self, name)
+        if name not in PROFILED_ACTIONS:
+            return attr
+
+        async def timed(*args, **kwargs):
+            step = f"{name} {_step_target(name, args)}".strip()
+            await self._profiler._begin_step(self._context)
+            started = time.perf_counter()
+            try:
+                return await attr(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                await self._profiler._end_step(self._context, self._site, step, elapsed_ms)
+        return timed
+
+class TimedEvent:
+    """Wraps a Playwright expect_* context manager so the wait for its event is timed as a step"""
+
+    def __init__(self, manager, page: ProfiledPage, step: str):
+        self._manager = manager
+        self._page = page
+        self._step = step
+        self._started = 0.0
+
+    async def __aenter__(self):
+        await self._page._profiler._begin_step(self._page._context)
+        self._started = time.perf_counter()
+        return await self._manager.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        try:
+            return await self._manager.__aexit__(*exc_info)
+        finally:
+            elapsed_ms = (time.perf_counter() - self._started) * 1000
+            await self._page._profiler._end_step(self._page._context, self._page._site, self._step, elapsed_ms)
+
+class BrowserProfiler:
+    """
+    Opt-in step-level profiling of Playwright automation
+
+    With BROWSER_PROFILING on, every page action is timed and appended to
+    BROWSER_PROFILE_FILE. Steps slower than BROWSER_SLOW_STEP_MS keep a
+    Playwright trace of just that step, and a context's HAR file is kept
+    only if it had a slow step.
+    """
+
+    def __init__(self):
+        self._contexts: Dict[int, Dict] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.BROWSER_PROFILING
+
+    async def new_context(self, browser, site: str):
+        """Create a browser context, recording HAR/traces when profiling"""
+        if not self.enabled:
+            return await browser.new_context()
+
+        os.makedirs(settings.BROWSER_PROFILE_ARTIFACTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        har_path = None
+        options = {}
+        if settings.BROWSER_PROFILE_HAR:
+            har_path = os.path.join(settings.BROWSER_PROFILE_ARTIFACTS_DIR, f"{site}_{stamp}.har")
+            options['record_har_path'] = har_path
+
+        context = await browser.new_context(**options)
+        if settings.BROWSER_PROFILE_TRACES:
+            await context.tracing.start(screenshots=True, snapshots=True)
+        self._contexts[id(context)] = {
+            'site': site, 'har_path': har_path, 'slow': False, 'stamp': stamp, 'steps': 0, 'depth': 0,
+        }
+        return context
+
+    async def new_page(self, context, site: str):
+        page = await context.new_page()
+        if not self.enabled:
+            return page
+        return ProfiledPage(page, context, site, self)
+
+    async def close_context(self, context):
+        """Close a context, discarding its HAR unless one of its steps was slow"""
+        state = self._contexts.pop(id(context), None)
+        if state and settings.BROWSER_PROFILE_TRACES:
+            try:
+                await context.tracing.stop()
+            except Exception as e:
+                logger.debug(f"Error stopping browser trace: {str(e)}")
+        await context.close()
+
+        if state and state['har_path'] and not state['slow']:
+            try:
+                os.remove(state['har_path'])
+            except OSError:
+                pass
+
+    async def _begin_step(self, context):
+        state = self._contexts.get(id(context))
+        if state is None:
+            return
+        # Steps nest inside expect_* waits; only the outermost one records a trace chunk
+        state['depth'] += 1
+        if settings.BROWSER_PROFILE_TRACES and state['depth'] == 1:
+            try:
+                await context.tracing.start_chunk()
+            except Exception as e:
+                logger.debug(f"Error starting browser trace chunk: {str(e)}")
+
+    async def _end_step(self, context, site: str, step: str, elapsed_ms: float):
+        state = self._contexts.get(id(context))
+        slow = elapsed_ms >= settings.BROWSER_SLOW_STEP_MS
+        trace_path = None
+
+        if state:
+            state['steps'] += 1
+            state['slow'] = state['slow'] or slow
+            state['depth'] -= 1
+            if settings.BROWSER_PROFILE_TRACES and state['depth'] == 0:
+                if slow:
+                    trace_path = os.path.join(
+                        settings.BROWSER_PROFILE_ARTIFACTS_DIR,
+                        f"{site}_{state['stamp']}_{state['steps']:03d}.zip"
+                    )
+                try:
+                    # Without a path the chunk is discarded
+                    await context.tracing.stop_chunk(path=trace_path)
+                except Exception as e:
+                    logger.debug(f"Error saving browser trace chunk: {str(e)}")
+                    trace_path = None
+
+        if slow:
+            logger.info(f"Slow browser step on {site}: {step} took {elapsed_ms:.0f}ms")
+        self._write({
+            'timestamp': datetime.utcnow().isoformat(),
+            'site': site,
+            'step': step,
+            'duration_ms': round(elapsed_ms, 1),
+            'slow': slow,
+            'trace_file': trace_path,
+        })
+
+    def _write(self, record: Dict):
+        try:
+            directory = os.path.dirname(settings.BROWSER_PROFILE_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(settings.BROWSER_PROFILE_FILE, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.debug(f"Could not record browser step: {str(e)}")
+
+profiler = BrowserProfiler()
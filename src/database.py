@@ -0,0 +1,140 @@
+from loguru import logger
+from sqlalchemy import MetaData, UniqueConstraint, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from config.config import settings
+
+def _normalize_url(database_url: str) -> str:
+    """Route plain Postgres URLs (as injected by Railway) through the asyncpg driver"""
+    for prefix in ('postgres://', 'postgresql://'):
+        if database_url.startswith(prefix):
+            return 'postgresql+asyncpg://' + database_url[len(prefix):]
+    return database_url
+
+def _sqlite_profile(url) -> dict:
+    options = {
+        'connect_args': {'timeout': settings.DB_BUSY_TIMEOUT},
+    }
+    # In-memory databases use a single static connection, so no pool sizing
+    if url.database and url.database != ':memory:':
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    return options
+
+def _postgres_profile() -> dict:
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+def _apply_sqlite_pragmas(engine: AsyncEngine):
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets the health/admin readers run while the worker writes
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT * 1000}")
+        cursor.close()
+
+def create_engine(database_url: str = None) -> AsyncEngine:
+    """
+    Create the async engine with the storage profile matching the backend
+
+    Args:
+        database_url: Overrides settings.DATABASE_URL
+
+    Returns:
+        AsyncEngine: Engine tuned for SQLite (WAL, busy timeout) or Postgres (asyncpg pool)
+    """
+    url = make_url(_normalize_url(database_url or settings.DATABASE_URL))
+
+    if url.get_backend_name() == 'sqlite':
+        engine = create_async_engine(url, **_sqlite_profile(url))
+        _apply_sqlite_pragmas(engine)
+        return engine
+
+    if url.get_backend_name() == 'postgresql':
+        return create_async_engine(url, **_postgres_profile())
+
+    return create_async_engine(url)
+
+def _model_unique_columns(table) -> set:
+    declared = {
+        frozenset(column.name for column in constraint.columns)
+        for constraint in table.constraints if isinstance(constraint, UniqueConstraint)
+    }
+    declared.update(frozenset([column.name]) for column in table.columns if column.unique)
+    return declared
+
+def _rebuild_sqlite_table(connection, table):
+    """SQLite can't drop a constraint, so copy the rows into a freshly created table"""
+    old_name = f"{table.name}_old"
+    inspector = inspect(connection)
+    columns = [c['name'] for c in inspector.get_columns(table.name)]
+    # Index names are global in SQLite; free them for the new table
+    for index in inspector.get_indexes(table.name):
+        connection.exec_driver_sql(f"DROP INDEX {index['name']}")
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {old_name}")
+    table.create(connection)
+    column_list = ', '.join(c for c in columns if c in table.columns)
+    connection.exec_driver_sql(f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {old_name}")
+    connection.exec_driver_sql(f"DROP TABLE {old_name}")
+
+def upgrade_schema(connection, metadata: MetaData):
+    """
+    Bring tables created by older versions in line with the models
+
+    create_all only creates missing tables. This adds missing columns (which
+    must be nullable or have a server default), creates missing indexes and
+    replaces unique constraints whose columns changed.
+    """
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT '{column.server_default.arg}'"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            connection.exec_driver_sql(ddl)
+            logger.info(f"Added column {table.name}.{column.name}")
+
+        declared = _model_unique_columns(table)
+        stale = [
+            constraint for constraint in inspector.get_unique_constraints(table.name)
+            if frozenset(constraint['column_names']) not in declared
+        ]
+        if stale and connection.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(connection, table)
+            logger.info(f"Rebuilt {table.name} without its old unique constraints")
+            continue
+        for constraint in stale:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} DROP CONSTRAINT {constraint['name']}")
+            logger.info(f"Dropped constraint {constraint['name']} from {table.name}")
+        if stale:
+            present = {frozenset(c['column_names']) for c in inspect(connection).get_unique_constraints(table.name)}
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint) or not constraint.name:
+                    continue
+                names = [column.name for column in constraint.columns]
+                if frozenset(names) in present:
+                    continue
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD CONSTRAINT {constraint.name} UNIQUE ({', '.join(names)})"
+                )
+                logger.info(f"Added constraint {constraint.name} to {table.name}")
+
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
@@ -1,17 +1,83 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, HTTPException, Header
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
+import secrets
 import os
 
+from config.config import settings
+from .services.circuit_breaker import breakers
+from .tenants import DEFAULT_TENANT
+
 app = FastAPI()
 
+class CycleRequest(BaseModel):
+    scrape: bool = Field(True, description="Scrape UnionBank before processing")
+
+class ReprocessRequest(BaseModel):
+    transaction_ids: List[str] = Field(..., min_length=1, description="Bank transaction IDs to reprocess")
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "environment": os.getenv('RAILWAY_ENVIRONMENT', 'development')
+        "environment": os.getenv('RAILWAY_ENVIRONMENT', 'development'),
+        "circuits": {name: state['state'] for name, state in breakers.snapshot().items()}
     }
 
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Check the bearer token and return the worker's TenantScheduler"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API is disabled")
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not secrets.compare_digest(token.encode(), settings.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    scheduler = getattr(app.state, 'scheduler', None)
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Worker is not running in this process")
+    return scheduler
+
+def tenant_manager(tenant: str = DEFAULT_TENANT, scheduler=Depends(require_admin)):
+    """Resolve the ?tenant= query parameter to that tenant's TransactionManager"""
+    manager = scheduler.manager(tenant)
+    if manager is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant {tenant}")
+    return manager
+
+@app.post("/admin/cycles", status_code=202)
+async def start_cycle(request: CycleRequest, manager=Depends(tenant_manager)):
+    return manager.request_cycle(scrape=request.scrape)
+
+@app.post("/admin/reprocess", status_code=202)
+async def reprocess(request: ReprocessRequest, manager=Depends(tenant_manager)):
+    return await manager.reprocess_transactions(request.transaction_ids)
+
+@app.get("/admin/progress")
+async def progress(manager=Depends(tenant_manager)):
+    return manager.progress.to_dict()
+
+@app.get("/admin/tenants")
+async def tenants(scheduler=Depends(require_admin)):
+    return scheduler.metrics()
+
+@app.get("/admin/breakers")
+async def circuit_breakers(scheduler=Depends(require_admin)):
+    return breakers.snapshot()
+
+async def serve(scheduler):
+    """Serve the health and admin API on the caller's event loop"""
+    import uvicorn
+
+    app.state.scheduler = scheduler
+    config = uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        log_level=settings.LOG_LEVEL.lower()
+    )
+    await uvicorn.Server(config).serve()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
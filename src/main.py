@@ -1,15 +1,24 @@
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import contextlib
+import time
+from sqlalchemy import delete, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
 from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
 from loguru import logger
 import sys
 import os
 
-from .models import Base, Transaction, Invoice, ProcessingError
+from .database import create_engine, upgrade_schema
+from .models import Base, Transaction, Invoice, ProcessingError, ArchivedTransaction
+from .tracing import span, current_trace_id, TraceContext
+from .tenants import Tenant, DEFAULT_TENANT
+from .services.fair_share import FairSemaphore
 from .scrapers.unionbank import UnionBankScraper
 from .services.invoice_finder import InvoiceFinder
+from .services.invoice_verifier import verifier
 from .services.cloudcfo_uploader import CloudCFOUploader
 from config.config import settings
 
@@ -21,24 +30,145 @@ logger.add(sys.stdout, level=settings.LOG_LEVEL)
 if not os.getenv('RAILWAY_ENVIRONMENT'):
     logger.add("logs/transaction_manager.log", rotation="500 MB")
 
-class TransactionManager:
+class CycleProgress:
+    """Live progress of the current processing cycle, reported by the admin API"""
+
+    def __init__(self):
+        self.running = False
+        self.phase = 'idle'
+        self.trace_id: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.total = 0
+        self.processed = 0
+        self.statuses: Dict[str, int] = {}
+        self.current_transaction: Optional[str] = None
+
+    def start(self, trace_id: Optional[str]):
+        self.running = True
+        self.trace_id = trace_id
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.total = 0
+        self.processed = 0
+        self.statuses = {}
+        self.current_transaction = None
+
+    def record(self, status: str):
+        self.processed += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def finish(self):
+        self.running = False
+        self.phase = 'idle'
+        self.current_transaction = None
+        self.finished_at = datetime.utcnow()
+
+    def to_dict(self) -> Dict:
+        return {
+            'running': self.running,
+            'phase': self.phase,
+            'trace_id': self.trace_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'total': self.total,
+            'processed': self.processed,
+            'statuses': self.statuses,
+            'current_transaction': self.current_transaction,
+        }
+
+class TenantMetrics:
+    """Cumulative counters of one tenant's cycles, reported by the admin API"""
+
     def __init__(self):
-        self.engine = create_async_engine(settings.DATABASE_URL)
+        self.cycles = 0
+        self.transactions_found = 0
+        self.transactions_processed = 0
+        self.statuses: Dict[str, int] = {}
+        self.busy_seconds = 0.0
+        self.last_cycle_seconds: Optional[float] = None
+        self.last_cycle_at: Optional[datetime] = None
+        self.next_cycle_in_seconds: Optional[float] = None
+
+    def record_cycle(self, found: int, progress: CycleProgress, seconds: float):
+        self.cycles += 1
+        self.transactions_found += found
+        self.transactions_processed += progress.processed
+        for status, count in progress.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.busy_seconds += seconds
+        self.last_cycle_seconds = round(seconds, 1)
+        self.last_cycle_at = datetime.utcnow()
+
+    def to_dict(self) -> Dict:
+        return {
+            'cycles': self.cycles,
+            'transactions_found': self.transactions_found,
+            'transactions_processed': self.transactions_processed,
+            'statuses': self.statuses,
+            'busy_seconds': round(self.busy_seconds, 1),
+            'last_cycle_seconds': self.last_cycle_seconds,
+            'last_cycle_at': self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+            'next_cycle_in_seconds': self.next_cycle_in_seconds,
+        }
+
+class TransactionManager:
+    def __init__(self, tenant: Tenant = None, engine=None):
+        self.tenant = tenant or Tenant(id=DEFAULT_TENANT)
+        self.tenant_id = self.tenant.id
+        config = self.tenant.settings
+        # Tenants served by one worker share its engine and connection pool
+        self.engine = engine or create_engine()
         self.SessionLocal = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
-        self.scraper = UnionBankScraper()
-        self.invoice_finder = InvoiceFinder()
-        self.uploader = CloudCFOUploader()
+        self.scraper = UnionBankScraper(config, self.tenant_id)
+        self.invoice_finder = InvoiceFinder(config, self.tenant_id, self.tenant.portals)
+        self.uploader = CloudCFOUploader(config, self.tenant_id)
+        self.progress = CycleProgress()
+        self.metrics = TenantMetrics()
+        # On-demand requests from the admin API wake the loop early
+        self._wake = asyncio.Event()
+        self._scrape_requested = False
+        # Ids reset to pending by reprocess while a pass runs; merged into its re-query
+        self._requeued = set()
+        # Consecutive scrapes that found nothing to do; stretches the interval
+        # when several tenants share the worker
+        self._idle_cycles = 0
+        self.idle_backoff = False
 
     async def init_db(self):
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema, Base.metadata)
+
+    async def process_transaction(self, session: AsyncSession, transaction: Transaction,
+                                  invoice: Optional[Invoice] = None, searched: bool = False,
+                                  trace: Optional[TraceContext] = None):
+        """
+        Find (unless already searched) and upload the invoice for a transaction
+
+        Args:
+            invoice: Invoice found by a batch search
+            searched: True if a batch search already ran, even if it found nothing
+            trace: Trace the batch search recorded this transaction's matching in
+        """
+        cycle_trace_id = current_trace_id()
+        with span('transaction', new_trace=True, reserved=trace, **{
+            'transaction.id': transaction.transaction_id,
+            'transaction.vendor': transaction.vendor,
+            'tenant': self.tenant_id,
+            'cycle.trace_id': cycle_trace_id,
+        }) as transaction_span:
+            await self._process_transaction(session, transaction, invoice, searched)
+            transaction_span.set_attribute('transaction.status', transaction.status)
 
-    async def process_transaction(self, session: AsyncSession, transaction: Transaction):
+    async def _process_transaction(self, session: AsyncSession, transaction: Transaction,
+                                   invoice: Optional[Invoice], searched: bool):
         try:
             # Find invoice
-            invoice = await self.invoice_finder.find_invoice(transaction)
+            if not searched:
+                invoice = await self.invoice_finder.find_invoice(transaction)
             if not invoice:
                 logger.warning(f"No invoice found for transaction {transaction.transaction_id}")
                 transaction.status = 'failed'
@@ -65,69 +195,434 @@ class TransactionManager:
             )
             session.add(error)
 
-    async def process_pending_transactions(self):
+    async def process_pending_transactions(self, *criteria, limit: Optional[int] = None) -> int:
+        """
+        Process pending transactions, optionally narrowed by extra WHERE criteria
+
+        Args:
+            limit: Stop after this many transactions, leaving the rest pending
+
+        Returns:
+            int: Number of transactions processed
+        """
+        processed = 0
         async with self.SessionLocal() as session:
-            # Get pending transactions
-            result = await session.execute(
-                select(Transaction).where(Transaction.status == 'pending')
+            # Commit in chunks so a crash mid-cycle keeps the status of
+            # transactions that were already uploaded
+            chunk_size = max(1, settings.PROCESSING_COMMIT_CHUNK_SIZE)
+            # Re-query once a batch is done so transactions queued for
+            # reprocessing while the cycle runs are merged into it. Rows are
+            # taken in id order, so everything up to last_id was already seen.
+            last_id = 0
+            while limit is None or processed < limit:
+                query = select(Transaction).where(
+                    Transaction.tenant == self.tenant_id,
+                    Transaction.status == 'pending',
+                    *criteria
+                )
+                requeued = list(self._requeued)
+                if requeued:
+                    query = query.where(or_(Transaction.id > last_id, Transaction.id.in_(requeued)))
+                else:
+                    query = query.where(Transaction.id > last_id)
+                query = query.order_by(Transaction.id)
+                if limit is not None:
+                    query = query.limit(limit - processed)
+                result = await session.execute(query)
+                pending_transactions = result.scalars().all()
+                if not pending_transactions:
+                    break
+
+                selected = [transaction.id for transaction in pending_transactions]
+                self._requeued.difference_update(selected)
+                last_id = max(last_id, selected[-1])
+
+                # Another worker or a backfill may be processing the same rows
+                claimed = await self._claim_transactions(session, selected)
+                pending_transactions = [t for t in pending_transactions if t.id in claimed]
+                if not pending_transactions:
+                    continue
+                ids = [transaction.id for transaction in pending_transactions]
+                self.progress.total += len(ids)
+
+                # Search once per vendor and source for the whole batch
+                invoices = None
+                traces = {transaction.id: TraceContext() for transaction in pending_transactions}
+                try:
+                    with span('cycle.find_invoices', transactions=len(pending_transactions)):
+                        invoices = await self.invoice_finder.find_invoices(pending_transactions, traces)
+                except Exception as e:
+                    logger.error(f"Batch invoice search failed, searching per transaction: {str(e)}")
+
+                try:
+                    for index, transaction in enumerate(pending_transactions):
+                        self.progress.current_transaction = transaction.transaction_id
+                        await self.process_transaction(
+                            session,
+                            transaction,
+                            invoice=invoices.get(transaction.id) if invoices is not None else None,
+                            searched=invoices is not None,
+                            trace=traces[transaction.id]
+                        )
+                        self.progress.record(transaction.status)
+                        processed += 1
+                        if processed % chunk_size == 0:
+                            if not await self._commit_chunk(session):
+                                # The rollback expired the batch; the re-query picks up its unprocessed rest
+                                rest = ids[index + 1:]
+                                self._requeued.update(rest)
+                                self.progress.total -= len(rest)
+                                break
+                            logger.debug(f"Checkpoint: {self.progress.processed}/{self.progress.total} transactions committed")
+
+                    await self._commit_chunk(session)
+                finally:
+                    # Hand rows this pass claimed but didn't finish back to pending
+                    await self._release_transactions(session, ids)
+        return processed
+
+    async def _claim_transactions(self, session: AsyncSession, ids: List[int]) -> set:
+        """Mark pending transactions as taken by this pass; returns the ids it got"""
+        result = await session.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(ids), Transaction.status == 'pending')
+            .values(status='matched')
+            .returning(Transaction.id),
+            execution_options={'synchronize_session': False}
+        )
+        claimed = set(result.scalars().all())
+        await session.commit()
+        return claimed
+
+    async def _release_transactions(self, session: AsyncSession, ids: List[int]):
+        """Reset claimed transactions that weren't committed as processed"""
+        try:
+            await session.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(ids), Transaction.status == 'matched')
+                .values(status='pending'),
+                execution_options={'synchronize_session': False}
             )
-            pending_transactions = result.scalars().all()
-            
-            for transaction in pending_transactions:
-                await self.process_transaction(session, transaction)
-            
             await session.commit()
+        except Exception as e:
+            logger.error(f"[{self.tenant_id}] Error releasing claimed transactions: {str(e)}")
+            await session.rollback()
 
-    async def check_new_transactions(self):
+    async def _commit_chunk(self, session: AsyncSession) -> bool:
+        """Commit processed transactions; on failure roll back so the pass can go on"""
+        try:
+            await session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"[{self.tenant_id}] Error committing processed transactions, they stay pending: {str(e)}")
+            await session.rollback()
+            return False
+
+    async def _insert_batch(self, session: AsyncSession, batch: List[Dict]) -> int:
+        """Insert the transactions of a batch that aren't in the database yet"""
+        # Check which transactions already exist with one query per batch
+        transaction_ids = [raw_tx['transaction_id'] for raw_tx in batch]
+        result = await session.execute(
+            select(Transaction.transaction_id).where(Transaction.transaction_id.in_(transaction_ids))
+        )
+        existing = set(result.scalars().all())
+        unknown = [transaction_id for transaction_id in transaction_ids if transaction_id not in existing]
+        if unknown:
+            # Archived transactions are gone from the hot table but must not be stored again
+            result = await session.execute(
+                select(ArchivedTransaction.transaction_id).where(ArchivedTransaction.transaction_id.in_(unknown))
+            )
+            existing.update(result.scalars().all())
+        
+        added = 0
+        for raw_tx in batch:
+            if raw_tx['transaction_id'] in existing:
+                continue
+            transaction = self.scraper._parse_transaction(raw_tx)
+            if transaction:
+                transaction.tenant = self.tenant_id
+                session.add(transaction)
+                existing.add(raw_tx['transaction_id'])
+                added += 1
+        
+        await session.commit()
+        return added
+
+    async def store_transaction_stream(self, stream: AsyncIterator[Dict]) -> int:
+        """
+        Insert transactions from a scraper stream in bounded batches
+
+        The scraper keeps running in its own task while batches are written, and
+        at most two batches wait in between, so memory stays constant however
+        long the history is.
+        """
+        batch_size = max(1, settings.SCRAPE_INSERT_BATCH_SIZE)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+        async def produce():
+            batch = []
+            try:
+                async for raw_tx in stream:
+                    batch.append(raw_tx)
+                    if len(batch) >= batch_size:
+                        await queue.put(batch)
+                        batch = []
+                if batch:
+                    await queue.put(batch)
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        added = 0
         try:
-            # Get new transactions from UnionBank
-            raw_transactions = await self.scraper.get_new_transactions()
-            
             async with self.SessionLocal() as session:
-                for raw_tx in raw_transactions:
-                    # Check if transaction already exists
-                    result = await session.execute(
-                        select(Transaction).where(
-                            Transaction.transaction_id == raw_tx['transaction_id']
-                        )
-                    )
-                    existing = result.scalar_one_or_none()
-                    
-                    if not existing:
-                        transaction = self.scraper._parse_transaction(raw_tx)
-                        if transaction:
-                            session.add(transaction)
+                while (batch := await queue.get()) is not None:
+                    added += await self._insert_batch(session, batch)
+        except BaseException:
+            producer.cancel()
+            # Let the scraper's cleanup finish before the caller moves on
+            with contextlib.suppress(Exception, asyncio.CancelledError):
+                await producer
+            raise
+
+        # Surface scraper errors after keeping whatever was already inserted
+        await producer
+        return added
+
+    async def store_recent_transactions(self) -> int:
+        """
+        Insert new transactions from the newest history pages
+
+        The history lists the newest transactions first, so paging stops at the
+        first page that adds nothing. Backfills walk a whole date range with
+        store_transaction_stream instead.
+        """
+        pages = self.scraper.iter_transaction_pages()
+        added = 0
+        try:
+            async with self.SessionLocal() as session:
+                async for rows in pages:
+                    page_added = await self._insert_batch(session, rows)
+                    added += page_added
+                    if not page_added:
+                        break
+        finally:
+            await pages.aclose()
+        return added
+
+    async def check_new_transactions(self) -> Optional[int]:
+        """Scrape and store new transactions; return how many were added, or None if the scrape failed"""
+        try:
+            # Insert new transactions from UnionBank until a page is all known
+            added = await self.store_recent_transactions()
+            logger.info(f"[{self.tenant_id}] Stored {added} new transactions")
+            return added
                 
-                await session.commit()
+        except Exception as e:
+            logger.error(f"[{self.tenant_id}] Error checking new transactions: {str(e)}")
+            return None
+
+    async def run_cycle(self, scrape: bool = True, max_transactions: Optional[int] = None) -> bool:
+        """
+        Run one scrape (optional) and processing pass
+
+        Args:
+            max_transactions: Process at most this many transactions this turn
+
+        Returns:
+            bool: True if pending work was left for another turn
+        """
+        started = time.monotonic()
+        found = processed = 0
+        with span('cycle', new_trace=True, scrape=scrape, tenant=self.tenant_id):
+            self._requeued = set()
+            self.invoice_finder.reset_cycle_cache()
+            self.progress.start(current_trace_id())
+            await self._load_source_stats()
+            try:
+                if scrape:
+                    logger.info(f"[{self.tenant_id}] Checking for new transactions...")
+                    self.progress.phase = 'scraping'
+                    with span('cycle.check_new_transactions'):
+                        found = await self.check_new_transactions()
                 
+                logger.info(f"[{self.tenant_id}] Processing pending transactions...")
+                self.progress.phase = 'processing'
+                with span('cycle.process_pending_transactions'):
+                    processed = await self.process_pending_transactions(limit=max_transactions)
+            finally:
+                self.metrics.record_cycle(found or 0, self.progress, time.monotonic() - started)
+                self.progress.finish()
+                # Portal sessions are reused within a cycle only
+                await self.invoice_finder.portal_scraper.close()
+                await self.flush_source_stats()
+                if self._requeued:
+                    self._wake.set()
+
+        # A failed scrape says nothing about whether the tenant is idle
+        if scrape and found is not None:
+            self._idle_cycles = self._idle_cycles + 1 if not (found or processed) else 0
+        return max_transactions is not None and processed >= max_transactions
+
+    async def _load_source_stats(self):
+        try:
+            async with self.SessionLocal() as session:
+                await self.invoice_finder.source_stats.load(session)
         except Exception as e:
-            logger.error(f"Error checking new transactions: {str(e)}")
+            logger.error(f"Error loading source stats: {str(e)}")
 
-    async def run(self):
-        await self.init_db()
-        
+    async def flush_source_stats(self):
+        """Persist per-vendor source hit rates and latencies recorded this cycle"""
+        try:
+            async with self.SessionLocal() as session:
+                await self.invoice_finder.source_stats.flush(session)
+        except Exception as e:
+            logger.error(f"Error saving source stats: {str(e)}")
+
+    def request_cycle(self, scrape: bool = True) -> Dict:
+        """
+        Ask for an immediate cycle
+
+        A request that arrives while a cycle is running is merged into it:
+        pending work is picked up by the running processing pass, and a scrape
+        requested after the running cycle finished scraping triggers a single
+        follow-up cycle instead of parallel work.
+        """
+        merged = self.progress.running
+        if merged and self.progress.phase == 'scraping':
+            # The running scrape and the processing after it cover this request
+            return {'started': False, 'merged': True, 'progress': self.progress.to_dict()}
+        if merged and not scrape:
+            return {'started': False, 'merged': True, 'progress': self.progress.to_dict()}
+
+        self._scrape_requested = self._scrape_requested or scrape
+        self._wake.set()
+        return {'started': not merged, 'merged': merged, 'progress': self.progress.to_dict()}
+
+    async def reprocess_transactions(self, transaction_ids: List[str]) -> Dict:
+        """Reset the given bank transaction IDs to pending and process them now"""
+        async with self.SessionLocal() as session:
+            result = await session.execute(
+                select(Transaction).where(
+                    Transaction.tenant == self.tenant_id,
+                    Transaction.transaction_id.in_(transaction_ids)
+                )
+            )
+            transactions = result.scalars().all()
+            if transactions:
+                # Bring an idle tenant back to the normal schedule
+                self._idle_cycles = 0
+
+            queued, skipped, reset_ids = [], [], []
+            for transaction in transactions:
+                if transaction.status == 'uploaded':
+                    skipped.append(transaction.transaction_id)
+                    continue
+                transaction.status = 'pending'
+                queued.append(transaction.transaction_id)
+                reset_ids.append(transaction.id)
+            if reset_ids:
+                # Processing searches again and adds a new Invoice; invoices.transaction_id is unique
+                await session.execute(delete(Invoice).where(Invoice.transaction_id.in_(reset_ids)))
+            await session.commit()
+
+        found = {t.transaction_id for t in transactions}
+        merged = bool(queued) and self.progress.running
+        if merged:
+            # The running pass merges these into its next re-query; ids it has
+            # not picked up by the time it finishes wake a follow-up cycle
+            self._requeued.update(reset_ids)
+        elif queued:
+            self._wake.set()
+
+        return {
+            'queued': queued,
+            'skipped_uploaded': skipped,
+            'not_found': [tid for tid in transaction_ids if tid not in found],
+            'merged': merged,
+        }
+
+    def next_interval(self) -> float:
+        """Seconds until the next scheduled cycle, doubling for each idle cycle up to the idle cap"""
+        if not self.idle_backoff:
+            return settings.CYCLE_INTERVAL_SECONDS
+        interval = settings.CYCLE_INTERVAL_SECONDS * 2 ** min(self._idle_cycles, 16)
+        return min(interval, max(settings.CYCLE_INTERVAL_SECONDS, settings.TENANT_IDLE_MAX_INTERVAL_SECONDS))
+
+    async def _wait_for_next_cycle(self, backlog: bool = False) -> bool:
+        """Sleep until the next scheduled cycle or an on-demand request; return whether to scrape"""
+        if backlog and not self._wake.is_set():
+            # Pending work is left; continue right away without scraping again
+            return False
+
+        interval = self.next_interval()
+        self.metrics.next_cycle_in_seconds = interval
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            return True
+        finally:
+            self.metrics.next_cycle_in_seconds = None
+
+        self._wake.clear()
+        scrape = self._scrape_requested
+        self._scrape_requested = False
+        return scrape
+
+    async def run(self, slots: Optional[FairSemaphore] = None):
+        """
+        Run cycles until cancelled; the database must already be initialised
+
+        Args:
+            slots: Cycle slots shared with other tenants; each turn processes at
+                most TENANT_MAX_TRANSACTIONS_PER_TURN transactions, then queues again,
+                and idle cycles stretch the interval
+        """
+        self.idle_backoff = slots is not None
+        scrape = True
         while True:
+            backlog = False
             try:
-                logger.info("Checking for new transactions...")
-                await self.check_new_transactions()
-                
-                logger.info("Processing pending transactions...")
-                await self.process_pending_transactions()
+                if slots is None:
+                    await self.run_cycle(scrape=scrape)
+                else:
+                    async with slots.slot(self.tenant_id):
+                        backlog = await self.run_cycle(scrape, settings.TENANT_MAX_TRANSACTIONS_PER_TURN)
                 
             except Exception as e:
-                logger.error(f"Error in main loop: {str(e)}")
+                logger.error(f"[{self.tenant_id}] Error in main loop: {str(e)}")
                 
             finally:
                 # Wait before next iteration
-                await asyncio.sleep(900)  # 15 minutes
+                scrape = await self._wait_for_next_cycle(backlog)
 
 async def startup():
     try:
-        manager = TransactionManager()
-        await manager.run()
+        from .scheduler import TenantScheduler
+        from .tenants import load_tenants
+
+        scheduler = TenantScheduler(load_tenants())
+        workers = [scheduler.run()]
+        if settings.ADMIN_API_TOKEN:
+            # Serve the admin API from the worker's event loop
+            from .health import serve
+            workers.append(serve(scheduler))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            verifier.shutdown()
     except Exception as e:
         logger.error(f"Critical error: {str(e)}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(startup())
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        from .backfill import main as backfill_main
+        asyncio.run(backfill_main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == 'archive':
+        from .archive import main as archive_main
+        asyncio.run(archive_main(sys.argv[2:]))
+    else:
+        asyncio.run(startup())
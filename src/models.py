@@ -1,14 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, Enum, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, Enum, ForeignKey, UniqueConstraint, Index, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from .tenants import DEFAULT_TENANT
 
 Base = declarative_base()
 
 class Transaction(Base):
     __tablename__ = 'transactions'
+    __table_args__ = (Index('ix_transactions_tenant_status', 'tenant', 'status'),)
     
     id = Column(Integer, primary_key=True)
+    tenant = Column(String, nullable=False, default=DEFAULT_TENANT, server_default=DEFAULT_TENANT)
     transaction_id = Column(String, unique=True, nullable=False)
     amount = Column(Numeric, nullable=False)
     date = Column(DateTime, nullable=False)
@@ -43,3 +46,42 @@ class ProcessingError(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     transaction = relationship("Transaction")
+
+class ArchivedTransaction(Base):
+    __tablename__ = 'archived_transactions'
+    
+    # Kept after archival so rescrapes and backfills still recognise the transaction
+    id = Column(Integer, primary_key=True)
+    tenant = Column(String, nullable=False, default=DEFAULT_TENANT, server_default=DEFAULT_TENANT)
+    transaction_id = Column(String, unique=True, nullable=False)
+    archive_file = Column(String, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class BackfillCheckpoint(Base):
+    __tablename__ = 'backfill_checkpoints'
+    __table_args__ = (UniqueConstraint('tenant', 'range_start', 'range_end', name='uq_backfill_tenant_range'),)
+    
+    id = Column(Integer, primary_key=True)
+    tenant = Column(String, nullable=False, default=DEFAULT_TENANT, server_default=DEFAULT_TENANT)
+    range_start = Column(DateTime, nullable=False)
+    range_end = Column(DateTime, nullable=False)
+    status = Column(Enum('pending', 'running', 'done', 'failed', name='backfill_status'), default='pending')
+    transactions_found = Column(Integer, default=0)
+    transactions_processed = Column(Integer, default=0)
+    error_message = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SourceStat(Base):
+    __tablename__ = 'source_stats'
+    __table_args__ = (UniqueConstraint('tenant', 'vendor', 'source', name='uq_source_stat'),)
+    
+    id = Column(Integer, primary_key=True)
+    tenant = Column(String, nullable=False, default=DEFAULT_TENANT, server_default=DEFAULT_TENANT)
+    vendor = Column(String, nullable=False)
+    source = Column(String, nullable=False)
+    attempts = Column(Integer, default=0)
+    hits = Column(Integer, default=0)
+    total_latency_ms = Column(Integer, default=0)
+    last_attempt_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
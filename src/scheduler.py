@@ -0,0 +1,79 @@
+import asyncio
+from typing import Dict, List, Optional
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from .database import create_engine
+from .main import TransactionManager
+from .tenants import Tenant
+from .browser_pool import browser_pool
+from .services.fair_share import FairSemaphore, api_quota
+from config.config import settings
+
+class TenantScheduler:
+    """
+    Runs the cycles of every tenant in one worker process
+
+    Each tenant gets its own TransactionManager (credentials, caches, source
+    clients) on a shared engine. With more than one tenant:
+
+    - at most TENANT_CONCURRENCY cycles run at once, and a tenant with a
+      backlog gives its slot back after TENANT_MAX_TRANSACTIONS_PER_TURN
+      transactions, with waiting tenants served round-robin;
+    - Gmail/Slack/Drive calls share an API_RATE_LIMIT per-minute quota, handed
+      out round-robin between waiting tenants;
+    - the shared Chromium is leased to BROWSER_MAX_TENANTS tenants at a time;
+    - a tenant whose scrapes keep finding nothing backs off towards
+      TENANT_IDLE_MAX_INTERVAL_SECONDS, so idle tenants only cost a sleeping task.
+
+    A single tenant keeps the plain CYCLE_INTERVAL_SECONDS schedule.
+    """
+
+    def __init__(self, tenants: List[Tenant]):
+        self.engine = create_engine()
+        self.SessionLocal = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.managers: Dict[str, TransactionManager] = {
+            tenant.id: TransactionManager(tenant, engine=self.engine) for tenant in tenants
+        }
+        self.shared = len(self.managers) > 1
+        self.slots = FairSemaphore(settings.TENANT_CONCURRENCY)
+        if self.shared:
+            api_quota.configure(settings.API_RATE_LIMIT)
+
+    def manager(self, tenant_id: str) -> Optional[TransactionManager]:
+        return self.managers.get(tenant_id)
+
+    async def run(self):
+        await next(iter(self.managers.values())).init_db()
+        logger.info(f"Serving {len(self.managers)} tenant(s): {', '.join(self.managers)}")
+        slots = self.slots if self.shared else None
+        await asyncio.gather(
+            *(manager.run(slots) for manager in self.managers.values()),
+            self._archive_loop()
+        )
+
+    async def _archive_loop(self):
+        """Archive old records of all tenants every ARCHIVE_INTERVAL_HOURS"""
+        if not settings.ARCHIVE_ENABLED:
+            return
+        from .archive import Archiver
+
+        while True:
+            try:
+                await Archiver(self.SessionLocal).run()
+            except Exception as e:
+                logger.error(f"Error archiving old records: {str(e)}")
+            await asyncio.sleep(settings.ARCHIVE_INTERVAL_HOURS * 3600)
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {
+            tenant_id: {
+                **manager.metrics.to_dict(),
+                'progress': manager.progress.to_dict(),
+                'cycle_slots': self.slots.usage(tenant_id),
+                'browser': browser_pool.usage(tenant_id),
+                'api': api_quota.usage(tenant_id),
+            }
+            for tenant_id, manager in self.managers.items()
+        }
@@ -1,25 +1,30 @@
-from playwright.async_api import async_playwright
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 from ..models import Transaction
-from config.config import settings
+from ..tracing import traced
+from ..browser_pool import browser_pool
+from ..tenants import DEFAULT_TENANT
+from config.config import Settings, settings
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 class UnionBankScraper:
-    def __init__(self):
-        self.url = settings.UNIONBANK_URL
-        self.username = settings.UNIONBANK_USERNAME
-        self.password = settings.UNIONBANK_PASSWORD
+    NEXT_PAGE_SELECTOR = 'a[rel="next"], button:has-text("Next")'
+
+    def __init__(self, config: Settings = None, tenant: str = DEFAULT_TENANT):
+        config = config or settings
+        self.url = config.UNIONBANK_URL
+        self.username = config.UNIONBANK_USERNAME
+        self.password = config.UNIONBANK_PASSWORD
+        self.tenant = tenant
 
     async def _init_browser(self):
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-        return playwright, browser, context, page
+        context = await browser_pool.new_context('unionbank', self.tenant)
+        page = await browser_pool.new_page(context, 'unionbank')
+        return context, page
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @traced('unionbank.login')
     async def login(self, page):
         try:
             await page.goto(self.url)
@@ -36,48 +41,102 @@ class UnionBankScraper:
             logger.error(f"Login failed: {str(e)}")
             raise
 
-    async def extract_transactions(self, page) -> List[Dict]:
-        transactions = []
-        try:
-            # Navigate to transactions page
-            await page.click('text=Transactions')
+    async def _open_transactions(self, page, date_from: Optional[datetime] = None,
+                                 date_to: Optional[datetime] = None):
+        # Navigate to transactions page
+        await page.click('text=Transactions')
+        await page.wait_for_load_state('networkidle')
+
+        # Narrow the history to a date range (used by backfills)
+        if date_from and date_to:
+            await page.fill('input[name="date_from"]', date_from.strftime('%Y-%m-%d'))
+            await page.fill('input[name="date_to"]', date_to.strftime('%Y-%m-%d'))
+            await page.click('button:has-text("Search")')
             await page.wait_for_load_state('networkidle')
+
+    @traced('unionbank.extract_page')
+    async def _extract_page(self, page) -> List[Dict]:
+        """Parse the transaction rows on the currently displayed page"""
+        transactions = []
+        rows = await page.query_selector_all('table tr')
+        for row in rows[1:]:  # Skip header row
+            columns = await row.query_selector_all('td')
             
-            # Extract transaction data
-            rows = await page.query_selector_all('table tr')
-            for row in rows[1:]:  # Skip header row
-                columns = await row.query_selector_all('td')
-                
-                date_text = await columns[0].inner_text()
-                amount_text = await columns[1].inner_text()
-                vendor_text = await columns[2].inner_text()
-                
-                transaction = {
-                    'date': datetime.strptime(date_text.strip(), '%Y-%m-%d'),
-                    'amount': float(amount_text.strip().replace('$', '').replace(',', '')),
-                    'vendor': vendor_text.strip(),
-                    'transaction_id': await columns[3].inner_text()  # Assuming there's a transaction ID column
-                }
-                transactions.append(transaction)
+            date_text = await columns[0].inner_text()
+            amount_text = await columns[1].inner_text()
+            vendor_text = await columns[2].inner_text()
+            
+            transaction = {
+                'date': datetime.strptime(date_text.strip(), '%Y-%m-%d'),
+                'amount': float(amount_text.strip().replace('$', '').replace(',', '')),
+                'vendor': vendor_text.strip(),
+                'transaction_id': await columns[3].inner_text()  # Assuming there's a transaction ID column
+            }
+            transactions.append(transaction)
+        return transactions
+
+    async def _next_page(self, page) -> bool:
+        """Follow the pagination link; return False on the last page"""
+        next_link = page.locator(self.NEXT_PAGE_SELECTOR)
+        if await next_link.count() == 0 or not await next_link.first.is_enabled():
+            return False
+        # Through the page so browser profiling times it
+        await page.click(self.NEXT_PAGE_SELECTOR)
+        await page.wait_for_load_state('networkidle')
+        return True
+
+    async def _iter_pages(self, page, date_from: Optional[datetime] = None,
+                          date_to: Optional[datetime] = None) -> AsyncIterator[List[Dict]]:
+        try:
+            await self._open_transactions(page, date_from, date_to)
+            for _ in range(settings.SCRAPE_MAX_PAGES):
+                yield await self._extract_page(page)
+                if not await self._next_page(page):
+                    break
                 
         except Exception as e:
             logger.error(f"Failed to extract transactions: {str(e)}")
             raise
-            
+
+    async def extract_transactions(self, page, date_from: Optional[datetime] = None,
+                                   date_to: Optional[datetime] = None) -> List[Dict]:
+        transactions = []
+        async for rows in self._iter_pages(page, date_from, date_to):
+            transactions.extend(rows)
         return transactions
 
-    async def get_new_transactions(self) -> List[Dict]:
-        playwright, browser, context, page = await self._init_browser()
+    async def iter_transaction_pages(self, date_from: Optional[datetime] = None,
+                                     date_to: Optional[datetime] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Yield the parsed rows of each history page while the browser session stays open
+
+        Stop early with aclose() to release the browser right away.
+        """
+        context, page = await self._init_browser()
         
         try:
             await self.login(page)
-            transactions = await self.extract_transactions(page)
-            return transactions
+            async for rows in self._iter_pages(page, date_from, date_to):
+                yield rows
             
         finally:
-            await context.close()
-            await browser.close()
-            await playwright.stop()
+            await browser_pool.close_context(context)
+
+    async def iter_transactions(self, date_from: Optional[datetime] = None,
+                                date_to: Optional[datetime] = None) -> AsyncIterator[Dict]:
+        """
+        Yield parsed transactions page by page while the browser session stays open
+
+        Only one page of rows is held in memory at a time.
+        """
+        async for rows in self.iter_transaction_pages(date_from, date_to):
+            for row in rows:
+                yield row
+
+    @traced('unionbank.get_new_transactions')
+    async def get_new_transactions(self, date_from: Optional[datetime] = None,
+                                   date_to: Optional[datetime] = None) -> List[Dict]:
+        return [row async for row in self.iter_transactions(date_from, date_to)]
 
     @staticmethod
     def _parse_transaction(raw_transaction: Dict) -> Optional[Transaction]:
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Dict, Optional
+from loguru import logger
+from config.config import settings
+
+class DependencyUnavailable(Exception):
+    """Raised when a dependency failed or was skipped, as opposed to answering that it has nothing"""
+
+class CircuitOpenError(DependencyUnavailable):
+    """Raised when a call is attempted on an open circuit"""
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker with a hard timeout per call
+
+    Closed: calls go through and outcomes are recorded in a sliding window.
+    Open: calls are rejected immediately until the cool-down has passed.
+    Half-open: a single trial call decides between closed and open.
+    """
+
+    def __init__(self, name: str, timeout: float, failure_rate: float = None, window: int = None,
+                 min_calls: int = None, cooldown: float = None):
+        self.name = name
+        self.timeout = timeout
+        self.failure_rate = failure_rate if failure_rate is not None else settings.BREAKER_FAILURE_RATE
+        self.min_calls = min_calls or settings.BREAKER_MIN_CALLS
+        self.cooldown = cooldown or settings.BREAKER_COOLDOWN_SECONDS
+        self.state = 'closed'
+        self.opened_at: Optional[float] = None
+        self._outcomes = deque(maxlen=window or settings.BREAKER_WINDOW)
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Return whether a call may go through now, moving open to half-open after the cool-down"""
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = 'half_open'
+            self._trial_in_flight = False
+            logger.info(f"Circuit {self.name} half-open, allowing a trial call")
+
+        if self.state == 'closed':
+            return True
+        if self.state == 'half_open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state == 'half_open':
+            logger.info(f"Circuit {self.name} closed after a successful trial")
+            self._outcomes.clear()
+        self.state = 'closed'
+        self._trial_in_flight = False
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        self._outcomes.append(False)
+        if self.state == 'half_open':
+            self._open()
+            return
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+        logger.warning(f"Circuit {self.name} opened for {self.cooldown}s")
+
+    async def call(self, awaitable: Awaitable):
+        """Await a call under the breaker and its timeout"""
+        if not self.allow():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = await asyncio.wait_for(awaitable, timeout=self.timeout)
+        except Exception:
+            self.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # Only our own cancellation lands here; don't count it against the dependency
+            self._trial_in_flight = False
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict:
+        failures = self._outcomes.count(False)
+        return {
+            'state': self.state,
+            'failure_rate': round(failures / len(self._outcomes), 2) if self._outcomes else 0.0,
+            'calls_in_window': len(self._outcomes),
+            'rejected': self.rejected,
+            'open_for_seconds': round(time.monotonic() - self.opened_at, 1) if self.state != 'closed' and self.opened_at else None,
+        }
+
+class CircuitBreakerRegistry:
+    """Breakers keyed by dependency name, e.g. 'gmail' or 'portal:aws'"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str, timeout: float) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(name, timeout)
+        return self._breakers[name]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+breakers = CircuitBreakerRegistry()
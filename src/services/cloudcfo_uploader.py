@@ -1,23 +1,26 @@
-from playwright.async_api import async_playwright
 from ..models import Transaction, Invoice
-from config.config import settings
+from ..tracing import span, traced
+from ..browser_pool import browser_pool
+from ..tenants import DEFAULT_TENANT
+from config.config import Settings, settings
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 class CloudCFOUploader:
-    def __init__(self):
-        self.url = settings.CLOUDCFO_URL
-        self.username = settings.CLOUDCFO_USERNAME
-        self.password = settings.CLOUDCFO_PASSWORD
+    def __init__(self, config: Settings = None, tenant: str = DEFAULT_TENANT):
+        config = config or settings
+        self.url = config.CLOUDCFO_URL
+        self.username = config.CLOUDCFO_USERNAME
+        self.password = config.CLOUDCFO_PASSWORD
+        self.tenant = tenant
 
     async def _init_browser(self):
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-        return playwright, browser, context, page
+        context = await browser_pool.new_context('cloudcfo', self.tenant)
+        page = await browser_pool.new_page(context, 'cloudcfo')
+        return context, page
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @traced('cloudcfo.login')
     async def login(self, page):
         try:
             await page.goto(self.url)
@@ -34,8 +37,10 @@ class CloudCFOUploader:
             logger.error(f"CloudCFO login failed: {str(e)}")
             raise
 
+    @traced('cloudcfo.upload_invoice')
     async def upload_invoice(self, transaction: Transaction, invoice: Invoice) -> bool:
-        playwright, browser, context, page = await self._init_browser()
+        with span('cloudcfo.init_browser'):
+            context, page = await self._init_browser()
         
         try:
             await self.login(page)
@@ -50,8 +55,7 @@ class CloudCFOUploader:
             await page.fill('input[name="vendor"]', transaction.vendor)
             
             # Upload file
-            input_file = await page.query_selector('input[type="file"]')
-            await input_file.set_input_files(invoice.file_path)
+            await page.set_input_files('input[type="file"]', invoice.file_path)
             
             # Submit form
             await page.click('button[type="submit"]')
@@ -69,6 +73,4 @@ class CloudCFOUploader:
             return False
             
         finally:
-            await context.close()
-            await browser.close()
-            await playwright.stop()
+            await browser_pool.close_context(context)
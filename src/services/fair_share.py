@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+class FairSemaphore:
+    """
+    Semaphore whose waiters are served round-robin by tenant instead of FIFO
+
+    A tenant queueing many acquisitions only ever gets one turn before every
+    other waiting tenant has had one, so a busy tenant can't starve the rest.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self.in_use = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._turns: Deque[str] = deque()
+        self.held: Dict[str, int] = defaultdict(int)
+        self.acquisitions: Dict[str, int] = defaultdict(int)
+        self.wait_seconds: Dict[str, float] = defaultdict(float)
+
+    async def acquire(self, tenant: str):
+        started = time.monotonic()
+        if self.in_use < self.slots and not self._turns:
+            self.in_use += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(tenant, deque()).append(future)
+            if tenant not in self._turns:
+                self._turns.append(tenant)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as we were cancelled
+                    self._hand_over()
+                else:
+                    self._forget(tenant, future)
+                raise
+
+        self.held[tenant] += 1
+        self.acquisitions[tenant] += 1
+        self.wait_seconds[tenant] += time.monotonic() - started
+
+    def release(self, tenant: str):
+        self.held[tenant] -= 1
+        self._hand_over()
+
+    def _hand_over(self):
+        """Give a freed slot to the next waiting tenant, or return it to the pool"""
+        while self._turns:
+            tenant = self._turns.popleft()
+            waiters = self._waiters[tenant]
+            future = waiters.popleft()
+            if waiters:
+                self._turns.append(tenant)
+            else:
+                del self._waiters[tenant]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    def _forget(self, tenant: str, future: asyncio.Future):
+        waiters = self._waiters.get(tenant)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            return
+        if not waiters:
+            del self._waiters[tenant]
+            self._turns.remove(tenant)
+
+    @asynccontextmanager
+    async def slot(self, tenant: str):
+        await self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def usage(self, tenant: str) -> Dict:
+        return {
+            'held': self.held.get(tenant, 0),
+            'waiting': len(self._waiters.get(tenant, ())),
+            'acquisitions': self.acquisitions.get(tenant, 0),
+            'wait_seconds': round(self.wait_seconds.get(tenant, 0.0), 1),
+        }
+
+class FairRateLimiter:
+    """Spaces external API calls to at most `per_minute`, serving waiting tenants round-robin"""
+
+    def __init__(self, per_minute: Optional[int] = None):
+        self.interval = 0.0
+        self.configure(per_minute)
+        self._turn = FairSemaphore(1)
+        self._next_at = 0.0
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.wait_seconds: Dict[str, float] = defaultdict(float)
+
+    def configure(self, per_minute: Optional[int]):
+        """Set the shared quota; None or 0 disables limiting"""
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+
+    async def acquire(self, tenant: str):
+        self.calls[tenant] += 1
+        if not self.interval:
+            return
+        started = time.monotonic()
+        async with self._turn.slot(tenant):
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = max(time.monotonic(), self._next_at) + self.interval
+        self.wait_seconds[tenant] += time.monotonic() - started
+
+    def usage(self, tenant: str) -> Dict:
+        return {
+            'calls': self.calls.get(tenant, 0),
+            'wait_seconds': round(self.wait_seconds.get(tenant, 0.0), 1),
+        }
+
+# Gmail, Slack and Drive calls of every tenant share this quota
+api_quota = FairRateLimiter()
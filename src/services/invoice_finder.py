@@ -1,214 +1,586 @@
+import asyncio
 import json
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from slack_sdk import WebClient
+import hashlib
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 from loguru import logger
-from typing import Optional
+from typing import Optional, Callable, Awaitable, Dict, List, Sequence
 import os
-from .portal_scraper import PortalScraper
+from .portal_scraper import PortalScraper, normalize_vendor
+from .invoice_verifier import verifier
+from .circuit_breaker import breakers, CircuitOpenError, DependencyUnavailable
+from .source_stats import SourceStats
+from .fair_share import api_quota
+from ..tracing import span, TraceContext
 from ..models import Transaction, Invoice
-from config.config import settings
-import aiohttp
+from ..tenants import DEFAULT_TENANT, scoped_name, invoice_dir
+from config.config import Settings, settings
 import base64
-from dateutil.parser import parse
+
+# Called with a downloaded file path; returns False to reject the candidate
+CandidateCheck = Callable[[str], Awaitable[bool]]
+
+def _build_google_client(service: str, version: str, credentials):
+    """
+    Build a Google API client from the discovery document bundled with
+    google-api-python-client, so startup never fetches it over the network
+    """
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    # Settings parse the credentials JSON; tenants may still pass it as a string
+    if isinstance(credentials, str):
+        credentials = json.loads(credentials)
+    creds = Credentials.from_authorized_user_info(credentials)
+    return build(
+        service,
+        version,
+        credentials=creds,
+        static_discovery=True,
+        cache_discovery=False
+    )
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    from dateutil.parser import parse
+
+    return parse(str(value))
+
+async def _execute(request):
+    """
+    Run a googleapiclient request in a worker thread so it can't block the
+    event loop and can be abandoned on timeout; httplib2 isn't thread-safe,
+    so each call gets its own authorized connection
+    """
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+
+    http = AuthorizedHttp(request.http.credentials, http=httplib2.Http())
+    return await asyncio.to_thread(request.execute, http=http)
+
+class InvoiceCandidate:
+    """A PDF found in a source; downloaded only when considered for a transaction"""
+
+    def __init__(self, source: str, key: str, date: Optional[datetime], name: str, ref: Dict):
+        self.source = source
+        self.key = key
+        self.date = date
+        self.name = name
+        # Source-specific identifiers needed to download the file
+        self.ref = ref
+
+    @property
+    def file_name(self) -> str:
+        digest = hashlib.sha1(self.key.encode()).hexdigest()[:16]
+        return f"{self.source}_{digest}.pdf"
 
 class InvoiceFinder:
-    def __init__(self):
-        self._setup_gmail_client()
-        self._setup_slack_client()
-        self._setup_drive_client()
-        self.portal_scraper = PortalScraper()
+    # Default search order; SourceStats reorders it per vendor from past hit rates
+    SOURCES = ('gmail', 'slack', 'drive', 'portal')
+
+    def __init__(self, config: Settings = None, tenant: str = DEFAULT_TENANT, portals: Dict = None):
+        self.config = config or settings
+        self.tenant = tenant
+        self.invoice_dir = invoice_dir(tenant)
+        # API clients are built lazily on first use
+        self._gmail = None
+        self._slack = None
+        self._drive = None
+        self.portal_scraper = PortalScraper(portals, tenant)
+        self.verifier = verifier
+        self.source_stats = SourceStats(tenant)
+        self.reset_cycle_cache()
+
+    @property
+    def gmail(self):
+        if self._gmail is None:
+            self._setup_gmail_client()
+        return self._gmail
+
+    @property
+    def slack(self):
+        if self._slack is None:
+            self._setup_slack_client()
+        return self._slack
+
+    @property
+    def drive(self):
+        if self._drive is None:
+            self._setup_drive_client()
+        return self._drive
         
     def _setup_gmail_client(self):
         """Setup Gmail API client"""
-        creds = Credentials.from_authorized_user_info(
-            json.loads(os.getenv('GMAIL_API_KEY'))
-        )
-        self.gmail = build('gmail', 'v1', credentials=creds)
+        self._gmail = _build_google_client('gmail', 'v1', self.config.GMAIL_API_KEY)
         
     def _setup_slack_client(self):
-        """Setup Slack client"""
-        self.slack = WebClient(token=os.getenv('SLACK_API_KEY'))
+        """Setup async Slack client"""
+        from slack_sdk.web.async_client import AsyncWebClient
+        from slack_sdk.http_retry.builtin_async_handlers import AsyncRateLimitErrorRetryHandler
+
+        self._slack = AsyncWebClient(token=self.config.SLACK_API_KEY)
+        # Wait out Retry-After on HTTP 429 (tier rate limits) instead of failing the search
+        self._slack.retry_handlers.append(
+            AsyncRateLimitErrorRetryHandler(max_retry_count=settings.SLACK_RATE_LIMIT_RETRIES)
+        )
         
     def _setup_drive_client(self):
         """Setup Google Drive client"""
-        creds = Credentials.from_authorized_user_info(
-            json.loads(os.getenv('DRIVE_API_KEY'))
-        )
-        self.drive = build('drive', 'v3', credentials=creds)
+        self._drive = _build_google_client('drive', 'v3', self.config.DRIVE_API_KEY)
     
+    def reset_cycle_cache(self):
+        """Forget candidate listings, downloads and claims from the previous cycle"""
+        keep = getattr(self, '_claimed', set()) | getattr(self, '_preexisting', set())
+        for key, file_path in getattr(self, '_downloads', {}).items():
+            # Rejected or unused downloads are not referenced by any Invoice
+            if key not in keep and file_path:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+        self._candidates: Dict[tuple, List[InvoiceCandidate]] = {}
+        self._downloads: Dict[str, Optional[str]] = {}
+        self._claimed = set()
+        self._slack_channel_files: Dict[tuple, List[InvoiceCandidate]] = {}
+        # Files already on disk from an earlier cycle may back an older Invoice
+        self._preexisting = set()
+
     async def find_invoice(self, transaction: Transaction) -> Optional[Invoice]:
         """
         Find invoice for a transaction by searching Gmail, Slack, Drive and vendor portals
+
+        Candidates whose PDF doesn't mention the transaction's amount and date
+        are rejected and the search moves on to the next candidate or source.
         
         Returns:
             Optional[Invoice]: Invoice object if found, None otherwise
         """
-        # Search in Gmail
-        invoice_path = await self._search_gmail(
-            transaction.vendor,
-            transaction.amount,
-            transaction.date
-        )
-        if invoice_path:
-            return Invoice(
-                transaction_id=transaction.id,
-                file_path=invoice_path,
-                source='gmail'
-            )
-            
-        # Search in Slack
-        invoice_path = await self._search_slack(
-            transaction.vendor,
-            transaction.amount,
-            transaction.date
-        )
-        if invoice_path:
-            return Invoice(
-                transaction_id=transaction.id,
-                file_path=invoice_path,
-                source='slack'
-            )
-            
-        # Search in Drive
-        invoice_path = await self._search_drive(
-            transaction.vendor,
-            transaction.amount,
-            transaction.date
-        )
-        if invoice_path:
-            return Invoice(
-                transaction_id=transaction.id,
-                file_path=invoice_path,
-                source='drive'
-            )
-            
-        # Fallback: Try vendor's billing portal
-        invoice_path = await self.portal_scraper.find_invoice_in_portal(
-            transaction.vendor,
-            transaction.amount,
-            transaction.date
-        )
-        if invoice_path:
-            return Invoice(
-                transaction_id=transaction.id,
-                file_path=invoice_path,
-                source='portal'
-            )
-            
-        logger.warning(f"No invoice found for transaction {transaction.id}")
-        return None
-        
-    async def _search_gmail(self, vendor: str, amount: float, date: str) -> Optional[str]:
-        """Search for invoice in Gmail"""
+        invoices = await self.find_invoices([transaction])
+        return invoices[transaction.id]
+
+    async def find_invoices(self, transactions: Sequence[Transaction],
+                            traces: Dict[int, TraceContext] = None) -> Dict[int, Optional[Invoice]]:
+        """
+        Find invoices for many transactions with one query per vendor per source
+
+        Transactions are grouped by vendor; each source is searched once per
+        vendor over the union of their date windows. Candidates are cached for
+        the cycle and assigned to transactions in memory by date proximity and
+        the amount/date check. Each candidate is assigned at most once.
+
+        Args:
+            traces: Reserved trace per Transaction.id; each transaction's matching,
+                download, verification and portal spans are recorded in it
+
+        Returns:
+            Dict[int, Optional[Invoice]]: Invoice (or None) keyed by Transaction.id
+        """
+        groups = defaultdict(list)
+        for transaction in transactions:
+            groups[transaction.vendor.strip()].append(transaction)
+
+        results = {}
+        for vendor, group in groups.items():
+            with span('finder.vendor', vendor=vendor, transactions=len(group)):
+                results.update(await self._find_for_vendor(vendor, group, traces or {}))
+        return results
+
+    async def _find_for_vendor(self, vendor: str, transactions: List[Transaction],
+                               traces: Dict[int, TraceContext]) -> Dict[int, Optional[Invoice]]:
+        results = {transaction.id: None for transaction in transactions}
+        unmatched = sorted(transactions, key=lambda t: t.date)
+        tolerance = timedelta(days=settings.INVOICE_DATE_TOLERANCE_DAYS)
+        date_from = unmatched[0].date - tolerance
+        date_to = unmatched[-1].date + tolerance
+
+        for source in self.source_stats.order(vendor, self.SOURCES):
+            if not unmatched:
+                break
+            if source == 'portal' and not self.portal_scraper.resolve_portal(vendor):
+                continue
+            # Listing is shared by the vendor's transactions; tag it with the ones it served
+            with span(f'finder.{source}', vendor=vendor, transactions=len(unmatched), **{
+                'transaction.ids': [transaction.transaction_id for transaction in unmatched],
+            }) as source_span:
+                started = time.monotonic()
+                candidates = None
+                if source != 'portal':
+                    candidates = await self._list_candidates(source, vendor, date_from, date_to)
+                    if candidates is None:
+                        # Source failed or its circuit is open; don't count it as a miss
+                        continue
+                remaining = []
+                searched = 0
+                unavailable_ms = 0.0
+                for transaction in unmatched:
+                    attempt_started = time.monotonic()
+                    with span('finder.match', parent=traces.get(transaction.id), source=source, **{
+                        'transaction.id': transaction.transaction_id,
+                    }) as match_span:
+                        try:
+                            # Portals are searched one transaction at a time
+                            if source == 'portal':
+                                invoice_path = await self._search_portal(
+                                    transaction.vendor,
+                                    transaction.amount,
+                                    transaction.date,
+                                    self._candidate_check(transaction)
+                                )
+                            else:
+                                invoice_path = await self._match_candidate(
+                                    transaction.date, candidates, self._candidate_check(transaction)
+                                )
+                        except DependencyUnavailable:
+                            # A failed portal or download says nothing about the vendor; not a miss
+                            invoice_path = None
+                            unavailable_ms += (time.monotonic() - attempt_started) * 1000
+                            match_span.set_attribute('unavailable', True)
+                        else:
+                            searched += 1
+                        match_span.set_attribute('found', bool(invoice_path))
+                    if invoice_path:
+                        results[transaction.id] = Invoice(
+                            transaction_id=transaction.id,
+                            file_path=invoice_path,
+                            source=source
+                        )
+                    else:
+                        remaining.append(transaction)
+                found = len(unmatched) - len(remaining)
+                source_span.set_attribute('found', found)
+                self.source_stats.record(
+                    vendor, source, searched, found, (time.monotonic() - started) * 1000 - unavailable_ms
+                )
+            unmatched = remaining
+
+        for transaction in unmatched:
+            logger.warning(f"No invoice found for transaction {transaction.id}")
+
+        return results
+
+    def _candidate_check(self, transaction: Transaction) -> CandidateCheck:
+        # Candidates are listed by vendor and date only, so the amount is always checked
+        check_date = settings.INVOICE_VERIFICATION_ENABLED
+
+        async def check(file_path: str) -> bool:
+            with span('finder.verify', file_path=file_path) as verify_span:
+                accepted = await self.verifier.verify(file_path, transaction, check_date=check_date)
+                verify_span.set_attribute('accepted', accepted)
+                return accepted
+        return check
+
+    async def _list_candidates(self, source: str, vendor: str, date_from: datetime,
+                               date_to: datetime) -> Optional[List[InvoiceCandidate]]:
+        """List a source's PDFs for a vendor and window, cached for the cycle; None if the source failed"""
+        key = (source, vendor, date_from.date(), date_to.date())
+        if key in self._candidates:
+            return self._candidates[key]
+
+        listers = {
+            'gmail': self._list_gmail_candidates,
+            'slack': self._list_slack_candidates,
+            'drive': self._list_drive_candidates,
+        }
         try:
-            # Build search query
-            query = f"from:{vendor} invoice amount:{amount} after:{date}"
-            
-            # Search emails
-            results = self.gmail.users().messages().list(
-                userId='me',
-                q=query
-            ).execute()
-            
-            messages = results.get('messages', [])
-            if not messages:
-                return None
-                
-            # Get first message with attachment
-            for msg in messages:
-                message = self.gmail.users().messages().get(
-                    userId='me',
-                    id=msg['id']
-                ).execute()
-                
-                if 'parts' in message['payload']:
-                    for part in message['payload']['parts']:
-                        if part['filename'].endswith('.pdf'):
-                            attachment = self.gmail.users().messages().attachments().get(
-                                userId='me',
-                                messageId=msg['id'],
-                                id=part['body']['attachmentId']
-                            ).execute()
-                            
-                            # Save attachment
-                            file_path = f"invoices/gmail_{vendor}_{date}_{amount}.pdf"
-                            with open(file_path, 'wb') as f:
-                                f.write(base64.urlsafe_b64decode(attachment['data']))
-                            return file_path
-                            
+            # Each request of the listing goes through the source's breaker and the API quota
+            candidates = await listers[source](vendor, date_from, date_to)
+        except CircuitOpenError:
+            logger.debug(f"Skipping {source.capitalize()} for {vendor}: circuit open")
             return None
-            
         except Exception as e:
-            logger.error(f"Error searching Gmail: {str(e)}")
+            # Not cached, so the source is retried while its breaker allows it
+            logger.error(f"Error searching {source.capitalize()}: {type(e).__name__} {str(e)}")
             return None
-            
-    async def _search_slack(self, vendor: str, amount: float, date: str) -> Optional[str]:
-        """Search for invoice in Slack"""
+
+        self._candidates[key] = candidates
+        return candidates
+
+    async def _match_candidate(self, date, candidates: List[InvoiceCandidate],
+                               check: Optional[CandidateCheck]) -> Optional[str]:
+        """
+        Download and check unclaimed candidates closest to the date until one is accepted
+
+        Raises:
+            DependencyUnavailable: If nothing was accepted and a candidate could not be downloaded
+        """
+        date = _as_datetime(date)
+        tolerance = timedelta(days=settings.INVOICE_DATE_TOLERANCE_DAYS)
+        nearby = [
+            c for c in candidates
+            if c.key not in self._claimed and (c.date is None or abs(c.date - date) <= tolerance)
+        ]
+        nearby.sort(key=lambda c: abs(c.date - date) if c.date else tolerance)
+
+        failed = 0
+        for candidate in nearby:
+            # Concurrent matches share the claims; one may have taken it while we awaited
+            if candidate.key in self._claimed:
+                continue
+            file_path = await self._download(candidate)
+            if not file_path:
+                failed += 1
+                continue
+            if (check is None or await check(file_path)) and candidate.key not in self._claimed:
+                self._claimed.add(candidate.key)
+                return file_path
+        if failed:
+            raise DependencyUnavailable(f"{failed} candidate(s) could not be downloaded")
+        return None
+
+    async def _download(self, candidate: InvoiceCandidate) -> Optional[str]:
+        """Download a candidate once per cycle; None if the download failed"""
+        if candidate.key in self._downloads:
+            return self._downloads[candidate.key]
+
+        os.makedirs(self.invoice_dir, exist_ok=True)
+        file_path = os.path.join(self.invoice_dir, candidate.file_name)
+        if os.path.exists(file_path):
+            self._preexisting.add(candidate.key)
         try:
-            # Build search query
-            query = f"from:{vendor} invoice amount:{amount} after:{date}"
-            
-            # Search messages
-            result = self.slack.search_messages(
-                query=query,
-                sort='timestamp',
-                sort_dir='desc'
-            )
-            
-            if not result['messages']['matches']:
-                return None
-                
-            # Look for file attachments
-            for message in result['messages']['matches']:
-                if 'files' in message:
-                    for file in message['files']:
-                        if file['name'].endswith('.pdf'):
-                            # Download file
-                            file_path = f"invoices/slack_{vendor}_{date}_{amount}.pdf"
-                            async with aiohttp.ClientSession() as session:
-                                async with session.get(file['url_private'], headers={
-                                    'Authorization': f'Bearer {settings.SLACK_API_KEY}'
-                                }) as response:
-                                    if response.status == 200:
-                                        with open(file_path, 'wb') as f:
-                                            f.write(await response.read())
-                                        return file_path
-                            
+            content = await self._call(candidate.source, self._fetch_candidate(candidate))
+            with open(file_path, 'wb') as f:
+                f.write(content)
+
+        except CircuitOpenError:
             return None
-            
         except Exception as e:
-            logger.error(f"Error searching Slack: {str(e)}")
-            return None
-            
-    async def _search_drive(self, vendor: str, amount: float, date: str) -> Optional[str]:
-        """Search for invoice in Google Drive"""
+            logger.error(f"Error downloading {candidate.name} from {candidate.source}: {type(e).__name__} {str(e)}")
+            file_path = None
+
+        self._downloads[candidate.key] = file_path
+        return file_path
+
+    async def _call(self, source: str, awaitable):
+        """Await one API request under the shared API quota and the source's circuit breaker and hard timeout"""
+        breaker = breakers.get(scoped_name(self.tenant, source), timeout=settings.SOURCE_TIMEOUT_SECONDS)
         try:
-            # Build search query
-            query = f"fullText contains '{vendor}' and fullText contains 'invoice' and fullText contains '{amount}'"
+            await api_quota.acquire(self.tenant)
+        except BaseException:
+            # Cancelled while waiting for the quota; the request never started
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        return await breaker.call(awaitable)
+
+    async def _fetch_candidate(self, candidate: InvoiceCandidate) -> bytes:
+        if candidate.source == 'gmail':
+            attachment = await _execute(self.gmail.users().messages().attachments().get(
+                userId='me',
+                messageId=candidate.ref['message_id'],
+                id=candidate.ref['attachment_id']
+            ))
+            return base64.urlsafe_b64decode(attachment['data'])
+
+        if candidate.source == 'slack':
+            import aiohttp
+
+            async with aiohttp.ClientSession() as session:
+                async with session.get(candidate.ref['url'], headers={
+                    'Authorization': f'Bearer {self.config.SLACK_API_KEY}'
+                }) as response:
+                    if response.status != 200:
+                        raise Exception(f"HTTP {response.status}")
+                    return await response.read()
+
+        request = self.drive.files().get_media(fileId=candidate.ref['file_id'])
+        return await _execute(request)
+
+    async def _list_gmail_candidates(self, vendor: str, date_from: datetime,
+                                     date_to: datetime) -> List[InvoiceCandidate]:
+        # Build search query
+        query = (
+            f"from:{vendor} invoice has:attachment filename:pdf "
+            f"after:{date_from:%Y/%m/%d} before:{date_to + timedelta(days=1):%Y/%m/%d}"
+        )
+
+        candidates = []
+        page_token = None
+        while True:
+            results = await self._call('gmail', _execute(self.gmail.users().messages().list(
+                userId='me',
+                q=query,
+                pageToken=page_token
+            )))
             
-            # Search files
-            results = self.drive.files().list(
+            for msg in results.get('messages', []):
+                message = await self._call('gmail', _execute(self.gmail.users().messages().get(
+                    userId='me',
+                    id=msg['id']
+                )))
+                sent_at = datetime.utcfromtimestamp(int(message['internalDate']) / 1000)
+                
+                for part in message['payload'].get('parts', []):
+                    if part['filename'].endswith('.pdf'):
+                        candidates.append(InvoiceCandidate(
+                            'gmail',
+                            f"{msg['id']}/{part['body']['attachmentId']}",
+                            sent_at,
+                            part['filename'],
+                            {'message_id': msg['id'], 'attachment_id': part['body']['attachmentId']}
+                        ))
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return candidates
+
+    async def _slack_pages(self, method: str, **params):
+        """Yield each page of a Slack list/search method, following cursors or page numbers"""
+        call = getattr(self.slack, method)
+        for _ in range(settings.SLACK_MAX_PAGES):
+            response = await self._call('slack', call(**params))
+            yield response
+
+            next_cursor = (response.get('response_metadata') or {}).get('next_cursor')
+            if next_cursor:
+                params['cursor'] = next_cursor
+                continue
+            paging = response.get('paging') or (response.get('messages') or {}).get('paging') or {}
+            if paging.get('page', 1) < paging.get('pages', 1):
+                params['page'] = paging['page'] + 1
+                continue
+            return
+
+    async def _list_slack_channel_pdfs(self, channel: str, date_from: datetime,
+                                       date_to: datetime) -> List[InvoiceCandidate]:
+        """List every PDF shared in a channel within the window, cached for the cycle"""
+        key = (channel, date_from.date(), date_to.date())
+        if key in self._slack_channel_files:
+            return self._slack_channel_files[key]
+
+        candidates = []
+        async for response in self._slack_pages(
+            'files_list',
+            channel=channel,
+            types='pdfs',
+            ts_from=str(int(date_from.timestamp())),
+            ts_to=str(int((date_to + timedelta(days=1)).timestamp()))
+        ):
+            for file in response.get('files', []):
+                candidates.append(InvoiceCandidate(
+                    'slack',
+                    file['id'],
+                    datetime.utcfromtimestamp(float(file['created'])),
+                    f"{file.get('name', '')} {file.get('title', '')}",
+                    {'url': file['url_private']}
+                ))
+
+        self._slack_channel_files[key] = candidates
+        return candidates
+
+    async def _list_slack_candidates(self, vendor: str, date_from: datetime,
+                                     date_to: datetime) -> List[InvoiceCandidate]:
+        channels = [c.strip() for c in (self.config.SLACK_INVOICE_CHANNELS or '').split(',') if c.strip()]
+        if channels:
+            # One files.list per channel serves every vendor; filter by name in memory
+            vendor_words = {w for w in normalize_vendor(vendor).split() if len(w) >= 4 and not w.isdigit()}
+            candidates = []
+            for channel in channels:
+                for candidate in await self._list_slack_channel_pdfs(channel, date_from, date_to):
+                    if vendor_words & set(normalize_vendor(candidate.name).split()):
+                        candidates.append(candidate)
+            return candidates
+
+        # Build search query
+        query = (
+            f"from:{vendor} invoice "
+            f"after:{date_from - timedelta(days=1):%Y-%m-%d} before:{date_to + timedelta(days=1):%Y-%m-%d}"
+        )
+        
+        # Search messages
+        candidates = []
+        async for response in self._slack_pages(
+            'search_messages',
+            query=query,
+            sort='timestamp',
+            sort_dir='desc',
+            cursor='*'
+        ):
+            for message in response['messages']['matches']:
+                for file in message.get('files', []):
+                    if file.get('filetype') == 'pdf' or file['name'].endswith('.pdf'):
+                        candidates.append(InvoiceCandidate(
+                            'slack',
+                            file['id'],
+                            datetime.utcfromtimestamp(float(message['ts'])),
+                            file['name'],
+                            {'url': file['url_private']}
+                        ))
+        return candidates
+
+    async def _list_drive_candidates(self, vendor: str, date_from: datetime,
+                                     date_to: datetime) -> List[InvoiceCandidate]:
+        from dateutil.parser import isoparse
+
+        # Build search query
+        query = (
+            f"fullText contains '{vendor}' and fullText contains 'invoice' "
+            f"and mimeType = 'application/pdf' "
+            f"and modifiedTime >= '{date_from:%Y-%m-%dT00:00:00}' "
+            f"and modifiedTime < '{date_to + timedelta(days=1):%Y-%m-%dT00:00:00}'"
+        )
+
+        candidates = []
+        page_token = None
+        while True:
+            results = await self._call('drive', _execute(self.drive.files().list(
                 q=query,
                 spaces='drive',
-                fields='files(id, name)',
-                orderBy='modifiedTime desc'
-            ).execute()
+                fields='nextPageToken, files(id, name, modifiedTime)',
+                orderBy='modifiedTime desc',
+                pageToken=page_token
+            )))
+
+            for file in results.get('files', []):
+                candidates.append(InvoiceCandidate(
+                    'drive',
+                    file['id'],
+                    isoparse(file['modifiedTime']).replace(tzinfo=None) if file.get('modifiedTime') else None,
+                    file['name'],
+                    {'file_id': file['id']}
+                ))
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return candidates
+
+    async def _search_source(self, source: str, vendor: str, date,
+                             check: Optional[CandidateCheck]) -> Optional[str]:
+        date = _as_datetime(date)
+        tolerance = timedelta(days=settings.INVOICE_DATE_TOLERANCE_DAYS)
+        candidates = await self._list_candidates(source, vendor, date - tolerance, date + tolerance)
+        if not candidates:
+            return None
+        try:
+            return await self._match_candidate(date, candidates, check)
+        except DependencyUnavailable:
+            return None
+        
+    async def _search_gmail(self, vendor: str, amount: float, date: str,
+                            check: Optional[CandidateCheck] = None) -> Optional[str]:
+        """Search for invoice in Gmail"""
+        return await self._search_source('gmail', vendor, date, check)
             
-            files = results.get('files', [])
-            if not files:
-                return None
-                
-            # Download first matching file
-            file_id = files[0]['id']
-            file_path = f"invoices/drive_{vendor}_{date}_{amount}.pdf"
+    async def _search_slack(self, vendor: str, amount: float, date: str,
+                            check: Optional[CandidateCheck] = None) -> Optional[str]:
+        """Search for invoice in Slack"""
+        return await self._search_source('slack', vendor, date, check)
             
-            request = self.drive.files().get_media(fileId=file_id)
-            with open(file_path, 'wb') as f:
-                f.write(request.execute())
+    async def _search_drive(self, vendor: str, amount: float, date: str,
+                            check: Optional[CandidateCheck] = None) -> Optional[str]:
+        """Search for invoice in Google Drive"""
+        return await self._search_source('drive', vendor, date, check)
+
+    async def _search_portal(self, vendor: str, amount: float, date: str,
+                             check: Optional[CandidateCheck] = None) -> Optional[str]:
+        """Search for invoice in the vendor's billing portal; raises DependencyUnavailable if it failed"""
+        file_path = await self.portal_scraper.search_invoice(vendor, amount, date)
+        if file_path and (check is None or await check(file_path)):
             return file_path
-            
-        except Exception as e:
-            logger.error(f"Error searching Drive: {str(e)}")
-            return None
+        if file_path:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        return None
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import multiprocessing
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+from loguru import logger
+from ..models import Transaction
+from config.config import settings
+
+# Formats an invoice date is likely to be printed in
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%B %d, %Y', '%b %d, %Y', '%d %B %Y', '%d %b %Y')
+AMOUNT_PATTERN = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+\.\d{1,2}|\d+')
+
+def extract_pdf_text(file_path: str) -> str:
+    """Extract text from every page of a PDF; runs in a worker process"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+def _date_forms(day) -> set:
+    forms = {day.strftime(fmt) for fmt in DATE_FORMATS}
+    # strftime zero-pads days; invoices often don't ("March 3, 2024")
+    forms.add(f"{day:%B} {day.day}, {day.year}")
+    forms.add(f"{day:%b} {day.day}, {day.year}")
+    forms.add(f"{day.day} {day:%B} {day.year}")
+    forms.add(f"{day.month}/{day.day}/{day.year}")
+    return forms
+
+def _hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class InvoiceVerifier:
+    """Checks that a candidate PDF mentions the transaction's amount and date"""
+
+    def __init__(self, max_workers: int = None, cache_size: int = 256):
+        self.max_workers = max_workers or settings.PDF_VERIFY_WORKERS
+        self.cache_size = cache_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._text_cache: "OrderedDict[str, str]" = OrderedDict()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # The worker already runs threads (to_thread, the default executor);
+            # forking it could copy a held lock into a child and deadlock it
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(method)
+            )
+        return self._executor
+
+    async def get_text(self, file_path: str) -> str:
+        """Return the PDF's text, parsing off the event loop and caching by file hash"""
+        loop = asyncio.get_running_loop()
+        file_hash = await loop.run_in_executor(None, _hash_file, file_path)
+        if file_hash in self._text_cache:
+            self._text_cache.move_to_end(file_hash)
+            return self._text_cache[file_hash]
+
+        text = await loop.run_in_executor(self._get_executor(), extract_pdf_text, file_path)
+        self._text_cache[file_hash] = text
+        if len(self._text_cache) > self.cache_size:
+            self._text_cache.popitem(last=False)
+        return text
+
+    @staticmethod
+    def contains_amount(text: str, amount) -> bool:
+        # Debits may be scraped as negative; invoices print the amount unsigned
+        target = abs(Decimal(str(amount))).quantize(Decimal('0.01'))
+        for match in AMOUNT_PATTERN.findall(text):
+            try:
+                if Decimal(match.replace(',', '')).quantize(Decimal('0.01')) == target:
+                    return True
+            except InvalidOperation:
+                continue
+        return False
+
+    @staticmethod
+    def contains_date(text: str, date, tolerance_days: int) -> bool:
+        haystack = text.lower()
+        for offset in range(-tolerance_days, tolerance_days + 1):
+            day = date + timedelta(days=offset)
+            if any(form.lower() in haystack for form in _date_forms(day)):
+                return True
+        return False
+
+    async def verify(self, file_path: str, transaction: Transaction, check_date: bool = True) -> bool:
+        """
+        Verify an invoice candidate against a transaction
+
+        Args:
+            check_date: Also require a date near the transaction's; the amount is always checked
+
+        Returns:
+            bool: False if the PDF's text contradicts the transaction, True otherwise.
+                PDFs without a text layer (scans) cannot be checked and are accepted.
+        """
+        try:
+            text = await self.get_text(file_path)
+        except Exception as e:
+            logger.warning(f"Could not read {file_path} for verification: {str(e)}")
+            return False
+
+        if not text.strip():
+            logger.warning(f"{file_path} has no text layer, skipping verification")
+            return True
+
+        if not self.contains_amount(text, transaction.amount):
+            logger.info(f"Rejected {file_path}: amount {transaction.amount} not found")
+            return False
+
+        if check_date and not self.contains_date(text, transaction.date, settings.INVOICE_DATE_TOLERANCE_DAYS):
+            logger.info(f"Rejected {file_path}: no date near {transaction.date:%Y-%m-%d}")
+            return False
+
+        return True
+
+    def shutdown(self):
+        """Stop the parsing processes; call when the worker exits"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Shared by every tenant's InvoiceFinder, so the worker runs one pool of parsing processes
+verifier = InvoiceVerifier()
@@ -1,105 +1,241 @@
-from playwright.async_api import async_playwright
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from loguru import logger
+import asyncio
 import json
 import os
-import json
+import re
+from .circuit_breaker import breakers, CircuitOpenError, DependencyUnavailable
+from ..tracing import span
+from ..browser_pool import browser_pool
+from ..tenants import DEFAULT_TENANT, scoped_name, invoice_dir
+from config.config import settings
+
+REQUIRED_PORTAL_KEYS = ('login_url', 'login_fields', 'login_button', 'invoice_link')
+
+def normalize_vendor(vendor: str) -> str:
+    """Uppercase a vendor string and collapse punctuation/whitespace into single spaces"""
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', vendor.upper()).split())
+
+class CompiledPortal:
+    """A validated portal configuration with precompiled vendor matchers"""
+
+    def __init__(self, name: str, config: Dict):
+        self.name = name
+        self.config = config
+        aliases = [name] + list(config.get('aliases', []))
+        self.aliases = [normalize_vendor(alias) for alias in aliases if normalize_vendor(alias)]
+        # Aliases match as whole words anywhere in the bank's vendor string,
+        # e.g. "amazon web services" matches "AMAZON WEB SERVICES PH 1234"
+        self.alias_patterns = [
+            re.compile(rf'(?:^| ){re.escape(alias)}(?: |$)') for alias in self.aliases
+        ]
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in config.get('patterns', [])]
+
+    @staticmethod
+    def validate(name: str, config: Dict) -> List[str]:
+        """Return a list of problems with a portal configuration, empty if valid"""
+        if not isinstance(config, dict):
+            return ["configuration must be an object"]
+        problems = [f"missing '{key}'" for key in REQUIRED_PORTAL_KEYS if key not in config]
+        for field in config.get('login_fields', []):
+            if 'selector' not in field or 'env_var' not in field:
+                problems.append("login_fields entries need 'selector' and 'env_var'")
+                break
+        if 'search_form' in config and 'search_button' not in config:
+            problems.append("'search_form' requires 'search_button'")
+        for pattern in config.get('patterns', []):
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                problems.append(f"invalid pattern {pattern!r}: {e}")
+        return problems
+
+class PortalSession:
+    """A logged-in browser context kept open for one portal during a cycle"""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.lock = asyncio.Lock()
 
 class PortalScraper:
-    def __init__(self):
-        # Load portal configurations from JSON
-        self.portals = self._load_portal_configs()
-        
+    def __init__(self, portals: Dict = None, tenant: str = DEFAULT_TENANT):
+        # Load portal configurations from JSON unless the tenant brings its own
+        self.portals = portals if portals is not None else self._load_portal_configs()
+        self.index = self._compile_portal_index(self.portals)
+        self.tenant = tenant
+        self.download_dir = invoice_dir(tenant)
+        self._resolution_cache: Dict[str, Optional[CompiledPortal]] = {}
+        self._sessions: Dict[str, PortalSession] = {}
+        self._session_lock = asyncio.Lock()
+
     def _load_portal_configs(self) -> Dict:
         """Load portal configurations from environment variable or default file"""
         portal_config = os.getenv('PORTAL_CONFIGS')
         if portal_config:
             return json.loads(portal_config)
-            
+
         # Default to empty config if not specified
         return {}
-        
-    async def _init_browser(self):
-        """Initialize playwright browser"""
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-        return playwright, browser, context, page
-        
+
+    def _compile_portal_index(self, portals: Dict) -> List[CompiledPortal]:
+        """Validate portal configurations and precompile their matchers"""
+        index = []
+        for name, config in portals.items():
+            problems = CompiledPortal.validate(name, config)
+            if problems:
+                logger.error(f"Skipping invalid portal configuration '{name}': {'; '.join(problems)}")
+                continue
+            index.append(CompiledPortal(name.lower(), config))
+        return index
+
+    def resolve_portal(self, vendor: str) -> Optional[CompiledPortal]:
+        """
+        Resolve a bank vendor string to a portal configuration
+
+        Exact alias matches win over whole-word alias matches, which win
+        over regex patterns. Results are memoized per vendor string.
+        """
+        if vendor in self._resolution_cache:
+            return self._resolution_cache[vendor]
+
+        normalized = normalize_vendor(vendor)
+        portal = (
+            next((p for p in self.index if normalized in p.aliases), None)
+            or next((p for p in self.index if any(a.search(normalized) for a in p.alias_patterns)), None)
+            or next((p for p in self.index if any(r.search(vendor) for r in p.patterns)), None)
+        )
+        self._resolution_cache[vendor] = portal
+        return portal
+
+    async def _get_session(self, portal: CompiledPortal) -> PortalSession:
+        """Return the open session for a portal, logging in on first use"""
+        async with self._session_lock:
+            session = self._sessions.get(portal.name)
+            if session:
+                return session
+
+            site = f"portal:{portal.name}"
+            context = await browser_pool.new_context(site, self.tenant)
+            page = await browser_pool.new_page(context, site)
+            try:
+                with span('portal.login', portal=portal.name):
+                    await self._login(page, portal.config)
+            except Exception:
+                await browser_pool.close_context(context)
+                raise
+
+            session = PortalSession(context, page)
+            self._sessions[portal.name] = session
+            return session
+
+    async def _login(self, page, portal_config: Dict):
+        # Navigate to login page
+        await page.goto(portal_config['login_url'])
+
+        # Fill login form
+        for field in portal_config['login_fields']:
+            await page.fill(field['selector'], os.getenv(field['env_var']))
+
+        # Submit login form
+        await page.click(portal_config['login_button'])
+        await page.wait_for_load_state('networkidle')
+
+    async def _drop_session(self, name: str):
+        session = self._sessions.pop(name, None)
+        if session:
+            try:
+                await browser_pool.close_context(session.context)
+            except Exception as e:
+                logger.debug(f"Error closing {name} portal session: {str(e)}")
+
+    async def close(self):
+        """Close all portal sessions; call at the end of each cycle"""
+        for name in list(self._sessions):
+            await self._drop_session(name)
+
+    async def _search_portal(self, portal: CompiledPortal, vendor: str, amount: float, date: str) -> Optional[str]:
+        portal_config = portal.config
+        session = await self._get_session(portal)
+
+        async with session.lock, span('portal.search', portal=portal.name):
+            page = session.page
+
+            # Navigate to invoices/billing page
+            if 'invoice_page_url' in portal_config:
+                await page.goto(portal_config['invoice_page_url'])
+            elif 'invoice_page_link' in portal_config:
+                await page.click(portal_config['invoice_page_link'])
+                await page.wait_for_load_state('networkidle')
+
+            # Search for invoice
+            if 'search_form' in portal_config:
+                for field in portal_config['search_form']:
+                    if field['type'] == 'date':
+                        await page.fill(field['selector'], date)
+                    elif field['type'] == 'amount':
+                        await page.fill(field['selector'], str(amount))
+
+                await page.click(portal_config['search_button'])
+                await page.wait_for_load_state('networkidle')
+
+            # Check if invoice exists
+            invoice_link = await page.query_selector(portal_config['invoice_link'])
+            if not invoice_link:
+                logger.warning(f"No invoice found for {vendor} amount={amount} date={date}")
+                return None
+
+            # Download invoice
+            os.makedirs(self.download_dir, exist_ok=True)
+            download_path = os.path.join(self.download_dir, f"{portal.name}_{date}_{amount}.pdf")
+            async with page.expect_download() as download_info:
+                await page.click(portal_config['invoice_link'])
+            download = await download_info.value
+
+            # Save invoice
+            await download.save_as(download_path)
+            logger.info(f"Successfully downloaded invoice from {vendor}'s portal")
+            return download_path
+
     async def find_invoice_in_portal(self, vendor: str, amount: float, date: str) -> Optional[str]:
         """
         Try to find and download an invoice from the vendor's billing portal
-        
+
         Args:
             vendor: Vendor name
             amount: Transaction amount
             date: Transaction date
-        
+
         Returns:
             Optional[str]: Path to downloaded invoice if successful, None otherwise
         """
+        try:
+            return await self.search_invoice(vendor, amount, date)
+        except DependencyUnavailable:
+            return None
+
+    async def search_invoice(self, vendor: str, amount: float, date: str) -> Optional[str]:
+        """
+        Like find_invoice_in_portal, but tells a failed search apart from a missing invoice
+
+        Raises:
+            DependencyUnavailable: If the portal failed or its circuit is open
+        """
         # Check if we have portal config for this vendor
-        portal_config = self.portals.get(vendor.lower())
-        if not portal_config:
+        portal = self.resolve_portal(vendor)
+        if not portal:
             logger.debug(f"No portal configuration found for vendor: {vendor}")
             return None
-            
+
+        breaker = breakers.get(scoped_name(self.tenant, f'portal:{portal.name}'), timeout=settings.PORTAL_TIMEOUT_SECONDS)
         try:
-            playwright, browser, context, page = await self._init_browser()
-            
-            try:
-                # Navigate to login page
-                await page.goto(portal_config['login_url'])
-                
-                # Fill login form
-                for field in portal_config['login_fields']:
-                    await page.fill(field['selector'], os.getenv(field['env_var']))
-                
-                # Submit login form
-                await page.click(portal_config['login_button'])
-                await page.wait_for_load_state('networkidle')
-                
-                # Navigate to invoices/billing page
-                if 'invoice_page_url' in portal_config:
-                    await page.goto(portal_config['invoice_page_url'])
-                elif 'invoice_page_link' in portal_config:
-                    await page.click(portal_config['invoice_page_link'])
-                    await page.wait_for_load_state('networkidle')
-                
-                # Search for invoice
-                if 'search_form' in portal_config:
-                    for field in portal_config['search_form']:
-                        if field['type'] == 'date':
-                            await page.fill(field['selector'], date)
-                        elif field['type'] == 'amount':
-                            await page.fill(field['selector'], str(amount))
-                            
-                    await page.click(portal_config['search_button'])
-                    await page.wait_for_load_state('networkidle')
-                
-                # Check if invoice exists
-                invoice_link = await page.query_selector(portal_config['invoice_link'])
-                if not invoice_link:
-                    logger.warning(f"No invoice found for {vendor} amount={amount} date={date}")
-                    return None
-                
-                # Download invoice
-                download_path = f"invoices/{vendor}_{date}_{amount}.pdf"
-                async with page.expect_download() as download_info:
-                    await invoice_link.click()
-                download = await download_info.value
-                
-                # Save invoice
-                await download.save_as(download_path)
-                logger.info(f"Successfully downloaded invoice from {vendor}'s portal")
-                return download_path
-                
-            finally:
-                await context.close()
-                await browser.close()
-                await playwright.stop()
-                
+            return await breaker.call(self._search_portal(portal, vendor, amount, date))
+
+        except CircuitOpenError:
+            logger.debug(f"Skipping {vendor}'s portal: circuit open")
+            raise
         except Exception as e:
             logger.error(f"Error accessing {vendor}'s portal: {str(e)}")
-            return None
+            # Don't reuse a session left in an unknown state
+            await self._drop_session(portal.name)
+            raise DependencyUnavailable(f"{portal.name} portal failed: {str(e)}") from e
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence, Tuple
+from loguru import logger
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .portal_scraper import normalize_vendor
+from ..models import SourceStat
+from ..tenants import DEFAULT_TENANT
+from config.config import settings
+
+def _insert(session: AsyncSession):
+    """INSERT construct with ON CONFLICT support for the session's backend"""
+    if session.bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+# Assumed cost of a source that has never been tried anywhere
+DEFAULT_COST_MS = 5000.0
+
+class SourceCounters:
+    def __init__(self, attempts: int = 0, hits: int = 0, latency_ms: float = 0.0, last_attempt_at: datetime = None):
+        self.attempts = attempts
+        self.hits = hits
+        self.latency_ms = latency_ms
+        self.last_attempt_at = last_attempt_at
+
+    def add(self, attempts: int, hits: int, latency_ms: float, at: datetime):
+        self.attempts += attempts
+        self.hits += hits
+        self.latency_ms += latency_ms
+        self.last_attempt_at = at
+
+class SourceStats:
+    """
+    Per-vendor hit rates and latencies of each invoice source for one tenant
+
+    Sources are tried in increasing order of mean cost / hit probability,
+    which minimizes the expected time to find an invoice when sources are
+    tried one after another. Counters live in memory during a cycle and are
+    persisted to the source_stats table by load()/flush(). Tenants search
+    with their own credentials, so each keeps its own statistics.
+    """
+
+    def __init__(self, tenant: str = DEFAULT_TENANT):
+        self.tenant = tenant
+        self._stats: Dict[Tuple[str, str], SourceCounters] = {}
+        self._pending: Dict[Tuple[str, str], SourceCounters] = {}
+
+    async def load(self, session: AsyncSession):
+        result = await session.execute(select(SourceStat).where(SourceStat.tenant == self.tenant))
+        self._stats = {
+            (row.vendor, row.source): SourceCounters(row.attempts, row.hits, row.total_latency_ms, row.last_attempt_at)
+            for row in result.scalars().all()
+        }
+
+    async def flush(self, session: AsyncSession):
+        """Add the counters recorded since the last flush to the database"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        insert = _insert(session)
+        for (vendor, source), delta in pending.items():
+            # Increment in SQL so concurrent flushes (backfill and worker) don't overwrite each other
+            statement = insert(SourceStat).values(
+                tenant=self.tenant,
+                vendor=vendor,
+                source=source,
+                attempts=delta.attempts,
+                hits=delta.hits,
+                total_latency_ms=int(delta.latency_ms),
+                last_attempt_at=delta.last_attempt_at,
+            )
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=['tenant', 'vendor', 'source'],
+                set_={
+                    'attempts': SourceStat.attempts + statement.excluded.attempts,
+                    'hits': SourceStat.hits + statement.excluded.hits,
+                    'total_latency_ms': SourceStat.total_latency_ms + statement.excluded.total_latency_ms,
+                    'last_attempt_at': statement.excluded.last_attempt_at,
+                    'updated_at': datetime.utcnow(),
+                }
+            ))
+        await session.commit()
+
+    def record(self, vendor: str, source: str, attempts: int, hits: int, latency_ms: float):
+        """Record that `attempts` transactions tried a source, `hits` of them finding their invoice"""
+        if attempts <= 0:
+            return
+        key = (normalize_vendor(vendor), source)
+        now = datetime.utcnow()
+        self._stats.setdefault(key, SourceCounters()).add(attempts, hits, latency_ms, now)
+        self._pending.setdefault(key, SourceCounters()).add(attempts, hits, latency_ms, now)
+
+    def _source_prior(self, source: str) -> SourceCounters:
+        """Counters for a source summed over all vendors, used until a vendor has its own history"""
+        total = SourceCounters()
+        for (_, stat_source), counters in self._stats.items():
+            if stat_source == source:
+                total.add(counters.attempts, counters.hits, counters.latency_ms, counters.last_attempt_at)
+        return total
+
+    def expected_cost(self, vendor: str, source: str) -> float:
+        counters = self._stats.get((normalize_vendor(vendor), source)) or self._source_prior(source)
+        if not counters.attempts:
+            return DEFAULT_COST_MS / 0.5
+        mean_cost = counters.latency_ms / counters.attempts
+        # Laplace smoothing keeps a never-hit source from being infinitely expensive
+        hit_rate = (counters.hits + 1) / (counters.attempts + 2)
+        return mean_cost / hit_rate
+
+    def _pruned(self, vendor: str, source: str) -> bool:
+        """A source that never produced an invoice for this vendor is skipped until it is due for re-exploration"""
+        counters = self._stats.get((normalize_vendor(vendor), source))
+        if not counters or counters.hits or counters.attempts < settings.SOURCE_PRUNE_MIN_ATTEMPTS:
+            return False
+        reexplore_after = timedelta(days=settings.SOURCE_REEXPLORE_DAYS)
+        return counters.last_attempt_at is not None and datetime.utcnow() - counters.last_attempt_at < reexplore_after
+
+    def order(self, vendor: str, sources: Sequence[str]) -> List[str]:
+        """Order (and prune) sources for a vendor by expected cost to find the invoice"""
+        if not settings.ADAPTIVE_SOURCE_ORDERING:
+            return list(sources)
+        kept = [s for s in sources if not self._pruned(vendor, s)] or list(sources)
+        ordered = sorted(kept, key=lambda s: self.expected_cost(vendor, s))
+        if ordered != list(sources):
+            logger.debug(f"Source order for {vendor}: {' -> '.join(ordered)}")
+        return ordered
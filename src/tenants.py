@@ -0,0 +1,70 @@
+import json
+import os
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from config.config import Settings, settings
+
+DEFAULT_TENANT = 'default'
+
+# Settings a tenant may override; everything else is shared by the worker
+TENANT_SETTINGS = (
+    'UNIONBANK_USERNAME', 'UNIONBANK_PASSWORD', 'UNIONBANK_URL',
+    'CLOUDCFO_USERNAME', 'CLOUDCFO_PASSWORD', 'CLOUDCFO_URL',
+    'GMAIL_API_KEY', 'DRIVE_API_KEY', 'SLACK_API_KEY', 'SLACK_INVOICE_CHANNELS',
+)
+REQUIRED_SETTINGS = ('UNIONBANK_USERNAME', 'UNIONBANK_PASSWORD', 'CLOUDCFO_USERNAME', 'CLOUDCFO_PASSWORD')
+
+def scoped_name(tenant: str, name: str) -> str:
+    """Per-tenant name for shared state such as circuit breakers; unchanged for the default tenant"""
+    return name if tenant == DEFAULT_TENANT else f"{tenant}:{name}"
+
+def invoice_dir(tenant: str) -> str:
+    return 'invoices' if tenant == DEFAULT_TENANT else os.path.join('invoices', tenant)
+
+class Tenant(BaseModel):
+    """A client company: one UnionBank account feeding one CloudCFO organisation"""
+
+    id: str = Field(..., pattern=r'^[a-z0-9_-]+$', description="Stable identifier stored on every row")
+    overrides: Dict[str, object] = Field(default_factory=dict, description="Settings overridden for this tenant")
+    portals: Optional[Dict] = Field(None, description="Vendor portal configs; defaults to PORTAL_CONFIGS")
+
+    @property
+    def settings(self) -> Settings:
+        return settings.model_copy(update=self.overrides)
+
+def _parse_tenant(raw: Dict) -> Tenant:
+    overrides = {key: value for key, value in raw.items() if key in TENANT_SETTINGS}
+    unknown = set(raw) - set(TENANT_SETTINGS) - {'id', 'portals'}
+    if unknown:
+        raise ValueError(f"Tenant {raw.get('id')}: unknown settings {', '.join(sorted(unknown))}")
+    for key in ('GMAIL_API_KEY', 'DRIVE_API_KEY'):
+        if isinstance(overrides.get(key), str):
+            overrides[key] = json.loads(overrides[key])
+    return Tenant(id=raw.get('id'), overrides=overrides, portals=raw.get('portals'))
+
+def load_tenants(raw: Optional[str] = None) -> List[Tenant]:
+    """
+    Load the tenants served by this worker
+
+    Without TENANTS the worker serves a single 'default' tenant configured by
+    the top-level settings, as before multi-tenancy.
+
+    Raises:
+        ValueError: If the config is malformed or a tenant lacks credentials
+    """
+    raw = raw if raw is not None else settings.TENANTS
+    if not raw:
+        tenants = [Tenant(id=DEFAULT_TENANT)]
+    else:
+        tenants = [_parse_tenant(entry) for entry in json.loads(raw)]
+
+    ids = [tenant.id for tenant in tenants]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Tenant ids must be unique")
+
+    for tenant in tenants:
+        config = tenant.settings
+        missing = [key for key in REQUIRED_SETTINGS if not getattr(config, key)]
+        if missing:
+            raise ValueError(f"Tenant {tenant.id} is missing {', '.join(missing)}")
+    return tenants
@@ -0,0 +1,137 @@
+import functools
+import json
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+from loguru import logger
+from config.config import settings
+
+# (trace_id, span_id) of the span currently active in this task
+_current: ContextVar[Optional[tuple]] = ContextVar('current_span', default=None)
+
+class Span:
+    """A timed unit of work, exported as an OpenTelemetry-shaped JSON object"""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict[str, Any],
+                 span_id: Optional[str] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id or secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = {'code': 'OK'}
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status = {'code': 'ERROR', 'message': f"{type(error).__name__}: {error}"}
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_span_id,
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'status': self.status,
+        }
+
+class JsonLinesExporter:
+    """Appends finished spans to a local JSON-lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+        except OSError as e:
+            logger.debug(f"Could not export span {span.name}: {str(e)}")
+
+class TraceContext:
+    """
+    A trace reserved before its root span opens
+
+    Work done for a transaction before it is processed (batch invoice
+    matching) is recorded as children of its root span, which then starts
+    at the first of them.
+    """
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.started_ns: Optional[int] = None
+
+_exporter: Optional[JsonLinesExporter] = None
+
+def _get_exporter() -> Optional[JsonLinesExporter]:
+    global _exporter
+    if not settings.TRACING_ENABLED:
+        return None
+    if _exporter is None:
+        _exporter = JsonLinesExporter(settings.TRACE_FILE)
+    return _exporter
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current[0] if current else None
+
+@contextmanager
+def span(name: str, new_trace: bool = False, parent: Optional[TraceContext] = None,
+         reserved: Optional[TraceContext] = None, **attributes):
+    """
+    Time a block of work as a span
+
+    Nested spans inherit the trace ID of the enclosing span; new_trace=True
+    starts a fresh trace (one per cycle and one per transaction). parent
+    records the span under a reserved trace instead, and reserved makes the
+    span that trace's root.
+    """
+    if reserved is not None:
+        current = Span(name, reserved.trace_id, None, attributes, span_id=reserved.span_id)
+        current.start_ns = reserved.started_ns or current.start_ns
+    elif parent is not None:
+        current = Span(name, parent.trace_id, parent.span_id, attributes)
+        parent.started_ns = parent.started_ns or current.start_ns
+    else:
+        enclosing = None if new_trace else _current.get()
+        trace_id = enclosing[0] if enclosing else secrets.token_hex(16)
+        current = Span(name, trace_id, enclosing[1] if enclosing else None, attributes)
+    token = _current.set((current.trace_id, current.span_id))
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        exporter = _get_exporter()
+        if exporter:
+            exporter.export(current)
+
+def traced(name: str):
+    """Decorator wrapping an async function in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator